@@ -41,7 +41,7 @@ def timeago(time):
 
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__, static_folder='static')
 
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
@@ -59,11 +59,21 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///manga_center.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Static file offload (see utils.static_files): behind nginx set the prefix of an
+    # `internal` location aliased to app/static; USE_X_SENDFILE is for Apache/lighttpd
+    app.config['STATIC_X_ACCEL_PREFIX'] = None
+    app.config['USE_X_SENDFILE'] = False
+
+    # tests pass their own database and settings
+    if test_config:
+        app.config.update(test_config)
+
 
     csrf.init_app(app)
     db.init_app(app)
     login_manager.init_app(app)
-    migrate = Migrate(app, db)
+    from app.utils.search_index import include_in_migrations
+    migrate = Migrate(app, db, include_object=include_in_migrations)
     moment.init_app(app)
 
     login_manager.login_view = 'users.login'
@@ -87,7 +97,17 @@ def create_app():
     app.register_blueprint(notif_bp)
     app.register_blueprint(search_bp)
 
+    from app.commands import register_commands
+    register_commands(app)
+
     from app import models  # make sure models are imported
+
+    from app.utils.static_files import init_static_files
+    init_static_files(app)
+    from app.utils.reading_progress import progress_buffer
+    progress_buffer.init_app(app)
+    from app.utils.view_counter import view_counter
+    view_counter.init_app(app)
     from flask_wtf.csrf import generate_csrf
 
     @app.context_processor
@@ -97,9 +117,9 @@ def create_app():
     @app.context_processor
     def inject_genres():
         # import here to avoid circular import during app creation
-        from app.models import Genre
+        from app.utils.genres import cached_genres
         try:
-            genres = Genre.query.order_by(Genre.name).all()
+            genres = cached_genres()
         except Exception:
             genres = []
         return dict(all_genres=genres)
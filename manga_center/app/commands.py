@@ -0,0 +1,325 @@
+import click
+from flask.cli import with_appcontext
+from app import db
+
+
+# ---------------------------------
+#       BACKFILL LAST CHAPTER
+# ---------------------------------
+@click.command('backfill-last-chapter')
+@with_appcontext
+def backfill_last_chapter():
+    """Fill Manga.last_chapter_at from the newest chapter of every manga."""
+    from app.models import Manga, Chapter
+
+    latest = (
+        db.session.query(db.func.max(Chapter.upload_date))
+        .filter(Chapter.manga_id == Manga.id)
+        .scalar_subquery()
+    )
+    updated = Manga.query.update({Manga.last_chapter_at: latest}, synchronize_session=False)
+    db.session.commit()
+
+    click.echo(f"Updated last_chapter_at for {updated} manga.")
+
+
+# ---------------------------------
+#       BUILD PAGE MANIFESTS
+# ---------------------------------
+@click.command('build-page-manifests')
+@click.option('--rebuild', is_flag=True, help='Rescan chapters that already have a manifest.')
+@with_appcontext
+def build_page_manifests(rebuild):
+    """Scan chapter folders once and store their ChapterPage manifest."""
+    import os
+    from flask import current_app
+    from app.models import Chapter
+    from app.utils.chapter_pages import build_chapter_pages
+
+    built = 0
+    for chapter in Chapter.query.filter(Chapter.content_path.isnot(None)).yield_per(100):
+        if chapter.pages and not rebuild:
+            continue
+        if not os.path.isdir(os.path.join(current_app.root_path, chapter.content_path)):
+            click.echo(f"Skipping chapter {chapter.id}: folder not found.")
+            continue
+        build_chapter_pages(current_app, chapter)
+        built += 1
+    db.session.commit()
+
+    click.echo(f"Built page manifests for {built} chapters.")
+
+
+# ---------------------------------
+#       REBUILD SEARCH INDEX
+# ---------------------------------
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Repopulate the FTS5 manga search index from scratch."""
+    from app.utils.search_index import rebuild_search_index
+
+    count = rebuild_search_index()
+    click.echo(f"Indexed {count} manga.")
+
+
+# ---------------------------------
+#       RECONCILE COUNTERS
+# ---------------------------------
+@click.command('reconcile-counters')
+@with_appcontext
+def reconcile_counters_command():
+    """Recompute bookmark/like/comment counters on Manga and Chapter, and unread notification counts."""
+    from app.utils.counters import reconcile_counters
+    from app.utils.search_index import invalidate_search_results
+
+    reconcile_counters()
+    invalidate_search_results()
+    click.echo("Counters reconciled.")
+
+
+# ---------------------------------
+#       COMPUTE TRENDING
+# ---------------------------------
+@click.command('compute-trending')
+@click.option('--half-life', default=48.0, show_default=True, help='Hours for an event to lose half its weight.')
+@click.option('--window', default=14, show_default=True, help='Days of events to consider.')
+@click.option('--every', default=0, help='Keep running and recompute every N seconds.')
+@with_appcontext
+def compute_trending_command(half_life, window, every):
+    """Score manga by recent, time-decayed activity into the TrendingScore snapshot."""
+    import time
+    from app.utils.trending import compute_trending
+    from app.utils.search_index import invalidate_search_results
+
+    while True:
+        count = compute_trending(half_life_hours=half_life, window_days=window)
+        # cached "trending" result pages are ordered by the old scores
+        invalidate_search_results()
+        click.echo(f"Trending scores written for {count} manga.")
+        if not every:
+            break
+        db.session.remove()
+        time.sleep(every)
+
+
+# ---------------------------------
+#       COMPUTE SIMILAR MANGA
+# ---------------------------------
+@click.command('compute-similar')
+@click.option('--top-k', default=12, show_default=True, help='Neighbours stored per manga.')
+@click.option('--chunk-size', default=512, show_default=True, help='Manga scored per sparse product.')
+@with_appcontext
+def compute_similar_command(top_k, chunk_size):
+    """Rebuild "readers also bookmarked" recommendations from Bookmark and Like."""
+    import time
+    from app.utils.recommendations import compute_similar_manga
+
+    started = time.perf_counter()
+    count = compute_similar_manga(top_k=top_k, chunk_size=chunk_size)
+    click.echo(f"Stored {count} similar-manga pairs in {time.perf_counter() - started:.1f}s.")
+
+
+# ---------------------------------
+#       BUILD PAGE DERIVATIVES
+# ---------------------------------
+@click.command('build-page-derivatives')
+@click.option('--rebuild', is_flag=True, help='Re-encode pages that already have variants.')
+@click.option('--batch-size', default=200, show_default=True, help='Pages processed per commit.')
+@with_appcontext
+def build_page_derivatives_command(rebuild, batch_size):
+    """Build resized WebP variants for chapter pages uploaded before the pipeline existed."""
+    from flask import current_app
+    from app.models import ChapterPage
+    from app.utils.derivatives import build_page_derivatives
+
+    query = ChapterPage.query.order_by(ChapterPage.id)
+    if not rebuild:
+        query = query.filter(ChapterPage.variants.is_(None))
+
+    built, last_id = 0, 0
+    while True:
+        pages = query.filter(ChapterPage.id > last_id).limit(batch_size).all()
+        if not pages:
+            break
+        built += build_page_derivatives(current_app, pages, overwrite=rebuild)
+        last_id = pages[-1].id
+        db.session.commit()
+
+    click.echo(f"Built derivatives for {built} pages.")
+
+
+# ---------------------------------
+#       BUILD THUMBNAILS
+# ---------------------------------
+@click.command('build-thumbnails')
+@click.option('--rebuild', is_flag=True, help='Regenerate images that already have variants.')
+@with_appcontext
+def build_thumbnails_command(rebuild):
+    """Create the card/thumbnail variants of existing covers and profile pictures."""
+    import os
+    from flask import current_app
+    from app.models import Manga, User
+    from app.utils.thumbnails import make_thumbnails, COVER_SIZES, PROFILE_PIC_SIZES
+
+    covers = Manga.query.filter(Manga.cover_image.isnot(None))
+    pics = User.query.filter(User.profile_pic.isnot(None))
+    if not rebuild:
+        covers = covers.filter(Manga.cover_variants.is_(None))
+        pics = pics.filter(User.profile_pic_variants.is_(None))
+
+    built = 0
+    for manga in covers:
+        source = os.path.join(current_app.static_folder, manga.cover_path)
+        manga.cover_variants = make_thumbnails(source, COVER_SIZES)
+        built += manga.cover_variants is not None
+    for user in pics:
+        user.profile_pic_variants = make_thumbnails(os.path.join(current_app.root_path, user.profile_pic), PROFILE_PIC_SIZES)
+        built += user.profile_pic_variants is not None
+    db.session.commit()
+
+    click.echo(f"Built thumbnails for {built} images.")
+
+
+# ---------------------------------
+#       CLEAN CHUNKED UPLOADS
+# ---------------------------------
+@click.command('clean-uploads')
+@click.option('--max-age', default=24 * 60 * 60, show_default=True, help='Seconds without activity before a partial upload is deleted.')
+@with_appcontext
+def clean_uploads_command(max_age):
+    """Delete abandoned chunked uploads from the instance folder."""
+    from app.utils.chunked_uploads import cleanup_expired_uploads
+
+    removed = cleanup_expired_uploads(max_age)
+    click.echo(f"Removed {removed} expired uploads.")
+
+
+# ---------------------------------
+#       BLOB STORE
+# ---------------------------------
+@click.command('gc-blobs')
+@click.option('--grace-hours', default=1.0, show_default=True, help='Keep unreferenced blobs touched more recently than this.')
+@click.option('--no-reconcile', is_flag=True, help='Trust the stored reference counts instead of recounting them.')
+@with_appcontext
+def gc_blobs_command(grace_hours, no_reconcile):
+    """Delete stored images that no page or cover uses any more."""
+    from datetime import timedelta
+    from app.utils.blobs import reconcile_blob_refs, collect_garbage
+
+    if not no_reconcile:
+        reconcile_blob_refs()
+        db.session.commit()
+
+    removed, freed = collect_garbage(timedelta(hours=grace_hours))
+    click.echo(f"Removed {removed} blobs ({freed / (1024 * 1024):.1f} MB).")
+
+
+@click.command('migrate-to-blobs')
+@with_appcontext
+def migrate_to_blobs_command():
+    """Move chapter pages, covers and profile pictures stored before the blob store into it."""
+    import os
+    import shutil
+    from flask import current_app
+    from app.models import Chapter, Manga, User
+    from app.utils.blobs import store_file
+    from app.utils.chapter_pages import get_chapter_pages
+    from app.utils.thumbnails import make_thumbnails, thumbnail_path, COVER_SIZES, PROFILE_PIC_SIZES
+
+    moved = 0
+    for chapter in Chapter.query.filter(Chapter.content_path.isnot(None)).order_by(Chapter.id).all():
+        # chapters older than the page manifest get one first
+        for page in get_chapter_pages(current_app, chapter) or []:
+            if page.blob_id is not None:
+                continue
+            source = os.path.join(current_app.static_folder, page.path)
+            if not os.path.exists(source):
+                click.echo(f"Skipping page {page.id}: file not found.")
+                continue
+            blob = store_file(source)
+            page.blob_id = blob.id
+            page.path = blob.path
+            page.variants = None  # rebuilt next to the blob by build-page-derivatives
+            moved += 1
+        db.session.commit()
+
+        # every page now lives in the store, the old folder can go
+        if chapter.pages and all(page.blob_id for page in chapter.pages):
+            shutil.rmtree(os.path.join(current_app.root_path, chapter.content_path), ignore_errors=True)
+            chapter.content_path = None
+            db.session.commit()
+
+    covers = 0
+    for manga in Manga.query.filter(Manga.cover_image.isnot(None), Manga.cover_blob_id.is_(None)):
+        source = os.path.join(current_app.static_folder, manga.cover_path)
+        if not os.path.exists(source):
+            click.echo(f"Skipping cover of manga {manga.id}: file not found.")
+            continue
+        old_files = [source] + [
+            os.path.join(current_app.static_folder, thumbnail_path(manga.cover_path, size))
+            for size in (manga.cover_variants or ())
+        ]
+        blob = store_file(source)
+        manga.cover_blob_id = blob.id
+        manga.cover_image = blob.path
+        manga.cover_variants = make_thumbnails(os.path.join(current_app.static_folder, blob.path), COVER_SIZES)
+        db.session.commit()
+        covers += 1
+
+        for path in old_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    pics = 0
+    for user in User.query.filter(User.profile_pic.isnot(None), User.profile_pic_blob_id.is_(None)):
+        source = os.path.join(current_app.root_path, user.profile_pic)
+        if not os.path.exists(source):
+            click.echo(f"Skipping profile picture of user {user.id}: file not found.")
+            continue
+        old_files = [source] + [
+            os.path.join(current_app.root_path, thumbnail_path(user.profile_pic, size))
+            for size in (user.profile_pic_variants or ())
+        ]
+        blob = store_file(source)
+        user.profile_pic_blob_id = blob.id
+        user.profile_pic = f"static/{blob.path}"
+        user.profile_pic_variants = make_thumbnails(os.path.join(current_app.static_folder, blob.path), PROFILE_PIC_SIZES)
+        db.session.commit()
+        pics += 1
+
+        for path in old_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    click.echo(f"Moved {moved} pages, {covers} covers and {pics} profile pictures; "
+               "run `flask build-page-derivatives` next.")
+
+
+# ---------------------------------
+#       RESUME NOTIFICATIONS
+# ---------------------------------
+@click.command('resume-notifications')
+@with_appcontext
+def resume_notifications_command():
+    """Finish new-chapter notification fan-outs cut short by a restart."""
+    from app.utils.notifications import resume_fan_outs
+
+    sent = resume_fan_outs()
+    click.echo(f"Sent {sent} notifications.")
+
+
+def register_commands(app):
+    """Attach the maintenance commands to `flask <command>`."""
+    app.cli.add_command(backfill_last_chapter)
+    app.cli.add_command(build_page_manifests)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(compute_trending_command)
+    app.cli.add_command(compute_similar_command)
+    app.cli.add_command(build_page_derivatives_command)
+    app.cli.add_command(build_thumbnails_command)
+    app.cli.add_command(clean_uploads_command)
+    app.cli.add_command(gc_blobs_command)
+    app.cli.add_command(migrate_to_blobs_command)
+    app.cli.add_command(resume_notifications_command)
@@ -1,8 +1,10 @@
 from app import db, login_manager
+from sqlalchemy import event, inspect
 import os
 from flask import url_for
 from flask_login import UserMixin
 from datetime import datetime
+from app.utils.thumbnails import thumbnail_path
 
 # ---------------------------------
 #               LOGIN LOADER
@@ -29,16 +31,33 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
-    profile_pic = db.Column(db.String(200), nullable=True)
+    profile_pic = db.Column(db.String(200), nullable=True)   # static/<blob path>, or an older per-user file
+    profile_pic_blob_id = db.Column(db.Integer, db.ForeignKey('blob.id'), nullable=True, index=True)
+    profile_pic_variants = db.Column(db.JSON(none_as_null=True), nullable=True)  # sizes built by utils.thumbnails
     is_admin = db.Column(db.Boolean, default=False)
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Unread Notification rows, kept in step wherever they are inserted, read or deleted
+    # (`flask reconcile-counters` recomputes it)
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def profile_pic_variant_url(self, size):
+        """URL of a PROFILE_PIC_SIZES variant, the original while it isn't built."""
+        if not self.profile_pic:
+            return url_for('static', filename='images/default_user.png')
+        # profile_pic is stored relative to the app root (static/uploads/profile_pic/...)
+        path = os.path.relpath(self.profile_pic, 'static').replace('\\', '/')
+        if size in (self.profile_pic_variants or ()):
+            path = thumbnail_path(path, size)
+        return url_for('static', filename=path)
+
     @property
     def profile_pic_url(self):
-        if self.profile_pic:
-            filename = os.path.basename(self.profile_pic)
-            return url_for('static', filename=f'uploads/profile_pics/{filename}')
-        return url_for('static', filename='images/default_user.png')
+        return self.profile_pic_variant_url('profile')
+
+    @property
+    def avatar_url(self):
+        return self.profile_pic_variant_url('avatar')
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -79,9 +98,26 @@ class Manga(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    cover_image = db.Column(db.String(200), nullable=True)
+    cover_image = db.Column(db.String(200), nullable=True)   # blob path, or a bare filename for old covers
+    cover_blob_id = db.Column(db.Integer, db.ForeignKey('blob.id'), nullable=True, index=True)
+    cover_variants = db.Column(db.JSON(none_as_null=True), nullable=True)  # sizes built by utils.thumbnails
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Upload date of the newest chapter, kept in sync by the author routes so the
+    # home feed can sort on an indexed column instead of aggregating Chapter.
+    last_chapter_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    # Popularity counters, bumped atomically where rows are added/removed
+    # (`flask reconcile-counters` recomputes them from the source tables)
+    bookmark_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Not derivable from other tables: only utils.view_counter writes it
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+    # Bumped whenever a chapter is added, edited or removed; keys the chapter TOC cache
+    toc_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
     author = db.relationship('Author', backref=db.backref('mangas', lazy=True))
 
@@ -92,6 +128,7 @@ class Manga(db.Model):
     comments = db.relationship('Comment', backref='manga', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('Like', backref='manga', lazy=True, cascade="all, delete-orphan")
     bookmarked_by = db.relationship('Bookmark', backref='manga', lazy=True, cascade="all, delete-orphan")
+    reading_progress = db.relationship('ReadingProgress', backref='manga', lazy=True, cascade="all, delete-orphan")
 
     # many-to-many genres
     genres = db.relationship('Genre', secondary=manga_genre, backref=db.backref('mangas', lazy='dynamic'))
@@ -100,17 +137,59 @@ class Manga(db.Model):
     def genre_names(self):
         return ", ".join([g.name for g in self.genres]) if self.genres else ""
 
+    # Set in bulk by utils.chapter_toc.load_latest_chapters for card grids
+    latest_chapters = None
+
     @property
     def latest_chapter_title(self):
+        if self.latest_chapters is not None:
+            return self.latest_chapters[0].title if self.latest_chapters else None
         latest = Chapter.query.filter_by(manga_id=self.id).order_by(Chapter.upload_date.desc()).first()
         return latest.title if latest else None
 
+    def cover_variant_url(self, size=None):
+        """URL of a COVER_SIZES variant (None: the original), the original while it isn't built."""
+        if not self.cover_image:
+            return url_for('static', filename='images/default_cover.jpg')
+        path = self.cover_path
+        if size in (self.cover_variants or ()):
+            path = thumbnail_path(path, size)
+        return url_for('static', filename=path)
+
+    @property
+    def cover_path(self):
+        """Cover location relative to the static folder."""
+        if not self.cover_image:
+            return None
+        if '/' in self.cover_image:
+            return self.cover_image
+        return f'uploads/manga_cover_images/{os.path.basename(self.cover_image)}'
+
     @property
     def cover_url(self):
-        if self.cover_image:
-            filename = os.path.basename(self.cover_image)
-            return url_for('static', filename=f'uploads/manga_cover_images/{filename}')
-        return url_for('static', filename='images/default_cover.jpg')
+        # card grids are the most common place a cover shows up
+        return self.cover_variant_url('card')
+
+    @property
+    def cover_thumb_url(self):
+        return self.cover_variant_url('thumb')
+
+    @property
+    def cover_large_url(self):
+        return self.cover_variant_url('large')
+
+    def refresh_last_chapter_at(self):
+        """Recompute last_chapter_at from this manga's chapters (call before commit)."""
+        self.last_chapter_at = (
+            db.session.query(db.func.max(Chapter.upload_date))
+            .filter(Chapter.manga_id == self.id)
+            .scalar()
+        )
+
+    def chapters_changed(self):
+        """Call before committing any chapter add/edit/delete of this manga."""
+        self.refresh_last_chapter_at()
+        self.toc_version = Manga.toc_version + 1
 
     def __repr__(self):
         return f"<Manga {self.title}>"
@@ -126,13 +205,164 @@ class Chapter(db.Model):
     content_path = db.Column(db.String(255), nullable=True)
     manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
 
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Last Bookmark.id notified of this chapter while the fan-out runs (0 = queued), NULL once done
+    notify_cursor = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_chapter_manga_upload_date', 'manga_id', 'upload_date'),
+        db.Index('ix_chapter_manga_number', 'manga_id', 'number'),
+    )
+
     # ✅ Removed duplicate relationship (backref already created by Manga)
     comments = db.relationship('Comment', backref='chapter', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('Like', backref='chapter', lazy=True, cascade="all, delete-orphan")
 
+    # Page manifest written at upload time, so readers never touch the filesystem
+    pages = db.relationship('ChapterPage', backref='chapter', lazy=True,
+                            order_by='ChapterPage.number', cascade="all, delete-orphan")
+
     def __repr__(self):
         return f"<Chapter {self.title} (Manga ID: {self.manga_id})>"
 
+# ---------------------------------
+#               CHAPTER PAGE
+# ---------------------------------
+class ChapterPage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), index=True, nullable=False)
+    number = db.Column(db.Integer, nullable=False)           # 1-based reading order
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(255), nullable=False)         # relative to the static folder
+    blob_id = db.Column(db.Integer, db.ForeignKey('blob.id'), nullable=True, index=True)  # NULL for pre-blob chapters
+    size = db.Column(db.Integer, nullable=True)              # bytes
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    # Resized WebP copies [{path, width, height, type}], filled in by utils.derivatives
+    variants = db.Column(db.JSON(none_as_null=True), nullable=True)
+
+    @property
+    def url(self):
+        return url_for('static', filename=self.path)
+
+    @property
+    def srcset(self):
+        """`srcset` value of the WebP variants, empty until they are built."""
+        return ", ".join(
+            f"{url_for('static', filename=v['path'])} {v['width']}w" for v in (self.variants or [])
+        )
+
+    def __repr__(self):
+        return f"<ChapterPage {self.number} (Chapter ID: {self.chapter_id})>"
+
+# ---------------------------------
+#               BLOB
+# ---------------------------------
+BLOB_FOLDER = 'uploads/blobs'
+
+
+def blob_path(sha256, ext):
+    """Static-relative path of a stored blob, sharded two levels deep by hash prefix."""
+    return f"{BLOB_FOLDER}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+class Blob(db.Model):
+    # One uploaded file, stored once by content (see utils.blobs)
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    ext = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    # Pages + covers pointing here; maintained by the events below
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    touched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def path(self):
+        return blob_path(self.sha256, self.ext)
+
+    def __repr__(self):
+        return f"<Blob {self.sha256[:12]} refs={self.ref_count}>"
+
+
+def _count_blob_refs(model, column):
+    """Keep Blob.ref_count in step with `model.<column>` through inserts, updates and (cascaded) deletes."""
+    def change(connection, blob_id, delta):
+        if blob_id is not None:
+            connection.execute(
+                Blob.__table__.update()
+                .where(Blob.__table__.c.id == blob_id)
+                .values(ref_count=Blob.__table__.c.ref_count + delta)
+            )
+
+    @event.listens_for(model, 'after_insert')
+    def inserted(mapper, connection, target):
+        change(connection, getattr(target, column), 1)
+
+    @event.listens_for(model, 'after_update')
+    def updated(mapper, connection, target):
+        history = inspect(target).attrs[column].history
+        for blob_id in history.deleted or ():
+            change(connection, blob_id, -1)
+        for blob_id in history.added or ():
+            change(connection, blob_id, 1)
+
+    @event.listens_for(model, 'before_delete')
+    def deleted(mapper, connection, target):
+        change(connection, getattr(target, column), -1)
+
+
+_count_blob_refs(ChapterPage, 'blob_id')
+_count_blob_refs(Manga, 'cover_blob_id')
+_count_blob_refs(User, 'profile_pic_blob_id')
+
+# ---------------------------------
+#               TRENDING SCORE
+# ---------------------------------
+class TrendingScore(db.Model):
+    # Snapshot written by `flask compute-trending`; requests only read it
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, index=True)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TrendingScore Manga:{self.manga_id} {self.score:.2f}>"
+
+# ---------------------------------
+#               VIEW ROLLUP
+# ---------------------------------
+class MangaViewHour(db.Model):
+    # Views of one manga during one hour (UTC, truncated), for time series and trending
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True, index=True)
+    page_views = db.Column(db.Integer, nullable=False, default=0)      # public.view_manga
+    chapter_views = db.Column(db.Integer, nullable=False, default=0)   # public.read_chapter
+
+    def __repr__(self):
+        return f"<MangaViewHour Manga:{self.manga_id} {self.hour:%Y-%m-%d %H}h>"
+
+# ---------------------------------
+#               MANGA SIMILARITY
+# ---------------------------------
+class MangaSimilarity(db.Model):
+    # Top-K "readers also bookmarked" neighbours, written by `flask compute-similar`
+    id = db.Column(db.Integer, primary_key=True)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
+    similar_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 1 = most similar
+
+    __table_args__ = (
+        db.Index('ix_manga_similarity_rank', 'manga_id', 'rank'),
+    )
+
+    def __repr__(self):
+        return f"<MangaSimilarity {self.manga_id} -> {self.similar_id} ({self.score:.3f})>"
+
 # ---------------------------------
 #               AUTHOR REQUEST
 # ---------------------------------
@@ -156,11 +386,34 @@ class Bookmark(db.Model):
 
     user = db.relationship('User', backref=db.backref('bookmarks', lazy=True, cascade="all, delete-orphan"))
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'manga_id', name='_user_manga_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'manga_id', name='_user_manga_uc'),
+        # walks a manga's bookmarkers in id order for the new-chapter fan-out
+        db.Index('ix_bookmark_manga_id', 'manga_id', 'id'),
+    )
 
     def __repr__(self):
         return f"<Bookmark User:{self.user_id} Manga:{self.manga_id}>"
 
+# ---------------------------------
+#           READING PROGRESS
+# ---------------------------------
+class ReadingProgress(db.Model):
+    # Where a user stopped reading a manga; written in batches by utils.reading_progress
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=True)  # NULL once the chapter is deleted
+    page = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    chapter = db.relationship('Chapter')
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'manga_id', name='_user_manga_progress_uc'),)
+
+    def __repr__(self):
+        return f"<ReadingProgress User:{self.user_id} Chapter:{self.chapter_id} Page:{self.page}>"
+
 # ---------------------------------
 #               COMMENT
 # ---------------------------------
@@ -172,11 +425,16 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     manga_id = db.Column(db.Integer, db.ForeignKey('manga.id'), nullable=False)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=True)
-    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), index=True, nullable=True)
 
     user = db.relationship('User', backref=db.backref('comments', lazy=True))
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy=True)
 
+    __table_args__ = (
+        # serves both the whole-chapter scan and keyset pages of top-level comments
+        db.Index('ix_comment_chapter_thread', 'chapter_id', 'parent_id', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f"<Comment {self.id} by User:{self.user_id}>"
 
@@ -215,6 +473,11 @@ class Notification(db.Model):
 
     user = db.relationship('User', backref=db.backref('notifications', lazy=True, cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        # keyset pagination of a user's feed, newest first
+        db.Index('ix_notification_user_created', 'user_id', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f"<Notification to:{self.user_id} message:{self.message[:25]}>"
 
@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from app import db
 from app.models import Admin, User, Author, AuthorRequest, Genre
 from app.forms.admin_forms import AddAuthorForm
+from app.utils.genres import invalidate_genres
 from werkzeug.security import generate_password_hash
 from slugify import slugify
 
@@ -187,6 +188,7 @@ def manage_genres():
                 g = Genre(name=name, slug=slug)
                 db.session.add(g)
                 db.session.commit()
+                invalidate_genres()
                 flash('Genre added', 'success')
             else:
                 flash('Genre already exists', 'warning')
@@ -211,6 +213,7 @@ def delete_genre(genre_id):
 
     db.session.delete(genre)
     db.session.commit()
+    invalidate_genres()
 
     flash("Genre deleted", "info")
     return redirect(url_for('admin.manage_genres'))
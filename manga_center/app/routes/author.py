@@ -1,12 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_from_directory, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_from_directory, current_app, jsonify
 from app.forms.manga_forms import MangaForm, ChapterForm
-from app.utils.file_utils import generate_manga_cover_filename
-from app.models import Manga, Chapter, Genre
-from app.utils.helpers import ensure_manga_folder
+from app.models import Manga, Chapter, Genre, ReadingProgress, MangaViewHour, TrendingScore, MangaSimilarity
+from app.utils.chapter_pages import build_pages_from_blobs, get_chapter_pages, reorder_chapter_pages
+from app.utils.blobs import store_upload
+from app.utils.derivatives import schedule_page_derivatives
+from app.utils.notifications import schedule_new_chapter_notifications
+from app.utils.thumbnails import make_thumbnails, COVER_SIZES
+from app.utils.chapter_uploads import save_chapter_uploads, ChapterUploadError
+from app.utils import chunked_uploads
+from app.utils.search_index import index_manga, unindex_manga, invalidate_search_results
+from app.utils.counters import bump
+from app.utils.chapter_toc import chapter_toc
 from app import db
-import os, zipfile
+import os, json, shutil
+from contextlib import contextmanager
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from wtforms.validators import Optional
+from werkzeug.datastructures import FileStorage
 from slugify import slugify
 
 author_bp = Blueprint('author', __name__, url_prefix='/author')
@@ -58,21 +68,14 @@ def add_manga():
             new_manga.genres = selected_genres
 
         db.session.add(new_manga)
+        db.session.flush()  # new_manga.id is generated here
+        index_manga(new_manga)
         db.session.commit()
+        invalidate_search_results()
 
         # Save cover image
         if cover_image_file:
-            filename = generate_manga_cover_filename(
-                manga_title=title,
-                manga_id=new_manga.id,
-                author_id=current_user.author_profile.id,
-                author_name=current_user.username,
-                original_filename=cover_image_file.filename
-            )
-            save_path = os.path.join(current_app.config['COVER_UPLOAD_FOLDER'], filename)
-            cover_image_file.save(save_path)
-
-            new_manga.cover_image = filename
+            set_manga_cover(new_manga, cover_image_file)
             db.session.commit()
 
         flash(f"Manga {title} Added Successfully!", "success")
@@ -81,6 +84,14 @@ def add_manga():
     return render_template('author/add_manga.html', form=form, genres=genres)
 
 
+def set_manga_cover(manga, file):
+    """Store an uploaded cover in the blob store and build its thumbnails (caller commits)."""
+    blob = store_upload(file)
+    manga.cover_blob_id = blob.id
+    manga.cover_image = blob.path
+    manga.cover_variants = make_thumbnails(os.path.join(current_app.static_folder, blob.path), COVER_SIZES)
+
+
 # View all Manga from author
 @author_bp.route('/my_manga')
 def my_manga():
@@ -111,19 +122,11 @@ def edit_manga(manga_id):
 
         # Cover image update
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = generate_manga_cover_filename(
-                manga_title=manga.title,
-                manga_id=manga.id,
-                author_id=current_user.author_profile.id,
-                author_name=current_user.username,
-                original_filename=file.filename
-            )
-            save_path = os.path.join(current_app.config['COVER_UPLOAD_FOLDER'], filename)
-            file.save(save_path)
-            manga.cover_image = filename
-        
+            set_manga_cover(manga, form.cover_image.data)
+
+        index_manga(manga)
         db.session.commit()
+        invalidate_search_results()
         flash('Manga updated successfully!', "success")
         return redirect(url_for('author.my_manga'))
 
@@ -146,8 +149,16 @@ def delete_manga(manga_id):
         flash('Access denied!', "danger")
         return redirect(url_for('author.my_manga'))
     
+    unindex_manga(manga.id)
+    MangaViewHour.query.filter_by(manga_id=manga.id).delete()
+    TrendingScore.query.filter_by(manga_id=manga.id).delete()
+    # both directions: its own neighbours and its place in other manga's lists
+    MangaSimilarity.query.filter(
+        (MangaSimilarity.manga_id == manga.id) | (MangaSimilarity.similar_id == manga.id)
+    ).delete(synchronize_session=False)
     db.session.delete(manga)
     db.session.commit()
+    invalidate_search_results()
 
     flash("Manga deleted successfully!", "info")
     return redirect(url_for('author.my_manga'))
@@ -167,56 +178,201 @@ def add_chapter(manga_id):
     form = ChapterForm()
 
     if form.validate_on_submit():
-        # Auto-increment chapter number
-        last_chapter = Chapter.query.filter_by(manga_id=manga.id)\
-                         .order_by(Chapter.number.desc()).first()
-        next_number = 1 if not last_chapter else last_chapter.number + 1
-
-        # Create DB entry first to get chapter.id
-        chapter = Chapter(
-            title=form.title.data,
-            number=next_number,
-            manga_id=manga.id
+        try:
+            chapter = create_chapter(manga, form.title.data, request.files.getlist("content"))
+        except ChapterUploadError as e:
+            flash(str(e), "warning")
+            return redirect(url_for('author.add_chapter', manga_id=manga.id))
+
+        flash(f"Chapter '{chapter.title}' added successfully!", "success")
+        return redirect(url_for('author.my_manga'))
+
+    return render_template('author/add_chapter.html', form=form, manga=manga)
+
+
+def create_chapter(manga, title, files):
+    """
+        Create the next chapter of `manga` from uploaded images and/or ZIP/CBZ archives.
+        Raises ChapterUploadError, leaving nothing behind, when no usable page was uploaded.
+    """
+    # Auto-increment chapter number
+    last_chapter = Chapter.query.filter_by(manga_id=manga.id)\
+                     .order_by(Chapter.number.desc()).first()
+    next_number = 1 if not last_chapter else last_chapter.number + 1
+
+    # Create DB entry first to get chapter.id
+    chapter = Chapter(
+        title=title,
+        number=next_number,
+        manga_id=manga.id
+    )
+    db.session.add(chapter)
+    db.session.commit()  # chapter.id is generated here
+
+    # Pages go to the content-addressed blob store (utils.blobs)
+    try:
+        uploads = save_chapter_uploads(files)
+        if not uploads:
+            raise ChapterUploadError("No images uploaded. Please select atleast one.")
+    except ChapterUploadError:
+        # Nothing usable was uploaded: drop the half-created chapter (blobs
+        # stored before the rejection are committed unreferenced, for gc-blobs)
+        db.session.delete(chapter)
+        manga.chapters_changed()
+        db.session.commit()
+        raise
+
+    pages = build_pages_from_blobs(chapter, uploads)
+    manga.chapters_changed()
+    chapter.notify_cursor = 0  # bookmarkers are notified in the background (utils.notifications)
+    db.session.commit()
+
+    # Resized WebP copies are built in the background, the reader uses them once ready
+    app = current_app._get_current_object()
+    schedule_page_derivatives(app, pages)
+    schedule_new_chapter_notifications(app, chapter)
+    return chapter
+
+
+# ---------------------------------
+#       CHUNKED CHAPTER UPLOADS
+# ---------------------------------
+# For chapters larger than MAX_CONTENT_LENGTH: the add and edit chapter pages send every
+# file as fixed-size chunks (POST to start, PUT per chunk, GET to resume),
+# then finalize_chapter_upload turns the uploads into a chapter (finalize_chapter_edit
+# into the new pages of one). Uploads are discarded once the chapter is saved.
+@author_bp.route('/uploads', methods=['POST'])
+def start_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    manga = db.session.get(Manga, data.get('manga_id') or 0)
+    if manga is None or manga.author_id != current_user.author_profile.id:
+        return jsonify(success=False, error="Manga not found."), 404
+
+    try:
+        upload = chunked_uploads.start_upload(
+            current_user.id, manga.id, str(data.get('filename') or 'upload'), int(data.get('size') or 0)
         )
-        db.session.add(chapter)
-        db.session.commit()  # chapter.id is generated here
+    except (ValueError, TypeError) as e:
+        return jsonify(success=False, error=str(e) or "Invalid upload."), 400
+
+    return jsonify(success=True, upload_id=upload['id'], chunk_size=upload['chunk_size'])
+
+
+@author_bp.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    upload = chunked_uploads.get_upload(upload_id, current_user.id)
+    if upload is None:
+        return jsonify(success=False, error="Upload not found or expired."), 404
+    return jsonify(success=True, size=upload['size'], chunk_size=upload['chunk_size'],
+                   missing=chunked_uploads.missing_chunks(upload))
+
+
+@author_bp.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    upload = chunked_uploads.get_upload(upload_id, current_user.id)
+    if upload is None:
+        return jsonify(success=False, error="Upload not found or expired."), 404
+
+    offset = request.args.get('offset', type=int)
+    try:
+        chunked_uploads.write_chunk(upload, offset if offset is not None else -1, request.get_data(cache=False))
+    except chunked_uploads.ChunkedUploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+    return jsonify(success=True)
+
+
+@author_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_chunked_upload(upload_id):
+    if chunked_uploads.get_upload(upload_id, current_user.id) is not None:
+        chunked_uploads.discard_upload(upload_id)
+    return jsonify(success=True)
+
+
+def finished_uploads(manga, upload_ids):
+    """
+        The current user's complete chunked uploads for `manga`, in the given order.
+        Returns (uploads, None), or (None, error response) when one is unknown or unfinished.
+    """
+    uploads = [chunked_uploads.get_upload(upload_id, current_user.id) for upload_id in upload_ids or []]
+    if not uploads or any(u is None or u['manga_id'] != manga.id for u in uploads):
+        return None, (jsonify(success=False, error="Upload not found or expired."), 404)
+    if any(chunked_uploads.missing_chunks(u) for u in uploads):
+        return None, (jsonify(success=False, error="Upload is not complete yet."), 409)
+    return uploads, None
+
+
+@contextmanager
+def opened_uploads(uploads):
+    """The assembled files of `uploads` as FileStorages, for the regular chapter upload code."""
+    streams = [chunked_uploads.open_upload(u) for u in uploads]
+    try:
+        yield [FileStorage(stream=stream, filename=u['filename']) for u, stream in zip(uploads, streams)]
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+@author_bp.route('/add_chapter/<int:manga_id>/finalize', methods=['POST'])
+def finalize_chapter_upload(manga_id):
+    manga = Manga.query.get_or_404(manga_id)
+    if manga.author_id != current_user.author_profile.id:
+        return jsonify(success=False, error="You are not authorized to add chapters to this manga."), 403
 
-        # Create folder: static/uploads/manga/<folder>/chapter_<number>/
-        manga_folder = ensure_manga_folder(current_app, manga)
-        chapter_folder = os.path.join(manga_folder, f"chapter_{chapter.number}")
-        os.makedirs(chapter_folder, exist_ok=True)
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()
+    if not title:
+        return jsonify(success=False, error="Chapter title is required."), 400
 
-        uploaded_files = request.files.getlist("content")
-        image_index = 1
-        saved_any_image = False
+    uploads, error = finished_uploads(manga, data.get('upload_ids'))
+    if error:
+        return error
 
-        for file in uploaded_files:
-            if file and file.filename:
-                saved_any_image = True
-                ext = os.path.splitext(secure_filename(file.filename))[1]  # .jpg, .png etc.
+    try:
+        with opened_uploads(uploads) as files:
+            chapter = create_chapter(manga, title, files)
+    except ChapterUploadError as e:
+        # The uploads stay until they expire, so the author can fix the title and finalize again
+        return jsonify(success=False, error=str(e)), 400
 
-                # NEW NAME FORMAT → mangaID_chapterID_imageNumber.ext
-                new_filename = f"{manga.id}_{chapter.id}_{image_index}{ext}"
+    for u in uploads:
+        chunked_uploads.discard_upload(u['id'])
 
-                file_path = os.path.join(chapter_folder, new_filename)
-                file.save(file_path)
+    flash(f"Chapter '{chapter.title}' added successfully!", "success")
+    return jsonify(success=True, redirect=url_for('author.my_manga'))
 
-                image_index += 1
 
-        if not saved_any_image:
-            flash("No images uploaded. Please select atleast one.", "warning")
-            db.session.delete(chapter)
-            db.session.commit()
-            return redirect(url_for('author.add_chapter', manga_id=manga.id))
+@author_bp.route('/edit_chapter/<int:chapter_id>/finalize', methods=['POST'])
+def finalize_chapter_edit(chapter_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    manga = chapter.manga
+    if manga.author_id != current_user.author_profile.id:
+        return jsonify(success=False, error="You are not authorized to edit this chapter."), 403
 
-        # Save relative path for frontend consumption
-        chapter.content_path = os.path.relpath(chapter_folder, current_app.root_path)
-        db.session.commit()
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()
+    try:
+        number = int(data.get('number'))
+    except (TypeError, ValueError):
+        number = None
+    if not title or number is None:
+        return jsonify(success=False, error="Chapter title and number are required."), 400
 
-        flash(f"Chapter '{chapter.title}' added successfully!", "success")
-        return redirect(url_for('author.my_manga'))
+    uploads, error = finished_uploads(manga, data.get('upload_ids'))
+    if error:
+        return error
+
+    try:
+        with opened_uploads(uploads) as files:
+            update_chapter(chapter, title, number, files=files)
+    except ChapterUploadError as e:
+        return jsonify(success=False, error=str(e)), 400
+
+    for u in uploads:
+        chunked_uploads.discard_upload(u['id'])
+
+    flash('Chapter updated successfully!', "success")
+    return jsonify(success=True, redirect=url_for('author.view_chapters', manga_id=manga.id))
 
-    return render_template('author/add_chapter.html', form=form, manga=manga)
 
 # Chapter List
 @author_bp.route('/manga/<int:manga_id>/chapters')
@@ -229,7 +385,7 @@ def view_chapters(manga_id):
         flash("You are not authorized to view chapters of  this manga.", "danger")
         return redirect(url_for('author.my_manga'))
     
-    chapters = Chapter.query.filter_by(manga_id=manga.id).order_by(Chapter.number.asc()).all()
+    chapters = chapter_toc(manga)
 
     return render_template('author/view_chapters.html', manga=manga, chapters=chapters)
 
@@ -245,25 +401,13 @@ def read_chapter(chapter_id):
         flash("You are not authorized to read this chapter.", "danger")
         return redirect(url_for('author.my_manga'))
     
-    # Build full path to the chapter folder
-    chapter_folder = os.path.join(current_app.root_path, chapter.content_path)
-
-    # Collect all image files from that folder
-    if not os.path.exists(chapter_folder):
+    # Pages come from the stored manifest
+    pages = get_chapter_pages(current_app, chapter)
+    if pages is None:
         flash("Chapter folder not found.", "danger")
         return redirect(url_for('author.view_chapters', manga_id=manga.id))
-    
-    image_files = sorted(
-        [f for f in os.listdir(chapter_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-    )
 
-    image_urls = [
-        url_for('static', filename=os.path.relpath(os.path.join(chapter.content_path, img), 'static').replace('\\','/'))
-        for img in image_files
-    ]
-
-
-    return render_template('author/read_chapter.html', manga=manga, chapter=chapter, image_urls=image_urls)
+    return render_template('author/read_chapter.html', manga=manga, chapter=chapter, pages=pages)
 
 # Edit Chapter
 @author_bp.route('/edit_chapter/<int:chapter_id>', methods=['GET', 'POST'])
@@ -278,37 +422,30 @@ def edit_chapter(chapter_id):
         return redirect(url_for('author.view_chapters', manga_id=manga.id))
     
     form = ChapterForm(obj=chapter)
+    # New pages are optional here, otherwise the stored manifest is kept (and can be reordered)
+    form.content.validators = [Optional()]
+    form.content.flags.required = False
 
     # ---- Collect existing images ----
-    chapter_folder = os.path.join(current_app.root_path, chapter.content_path)
-    image_files = []
-    if os.path.exists(chapter_folder):
-        for img in os.listdir(chapter_folder):
-            if img.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
-                rel_path = os.path.relpath(os.path.join(chapter.content_path, img), 'static').replace('\\', '/')
-                image_files.append(url_for('static', filename=rel_path))
+    pages = get_chapter_pages(current_app, chapter) or []
 
     # ---- Handle Form Submission ----
     if form.validate_on_submit():
-        chapter.title = form.title.data
-        chapter.number = form.number.data
-
-        # Update images if new ones are uploaded
-        if form.content.data:
-            # Ensure folder exists
-            os.makedirs(chapter_folder, exist_ok=True)
+        # Update images if new ones are uploaded, otherwise just apply the drag & drop page order
+        new_files = [f for f in (form.content.data or []) if f and f.filename]
+        ordered_ids = []
+        if not new_files and request.form.get('image_order'):
+            try:
+                ordered_ids = json.loads(request.form['image_order'])
+            except ValueError:
+                ordered_ids = []
+
+        try:
+            update_chapter(chapter, form.title.data, form.number.data, files=new_files, ordered_ids=ordered_ids)
+        except ChapterUploadError as e:
+            flash(str(e), "warning")
+            return redirect(url_for('author.edit_chapter', chapter_id=chapter.id))
 
-            # Remove old images first
-            for old_file in os.listdir(chapter_folder):
-                os.remove(os.path.join(chapter_folder, old_file))
-
-            # Save New Images
-            for file in form.content.data:
-                if file and file.filename:
-                    filename = secure_filename(file.filename)
-                    file.save(os.path.join(chapter_folder, filename))
-
-        db.session.commit()
         flash('Chapter updated successfully!', "success")
         return redirect(url_for('author.view_chapters', manga_id=manga.id))
     
@@ -317,10 +454,49 @@ def edit_chapter(chapter_id):
         form=form,
         manga=manga,
         chapter=chapter,
-        image_files=image_files
+        pages=pages
     )
 
 
+def update_chapter(chapter, title, number, files=None, ordered_ids=None):
+    """
+        Save an edit of `chapter`: replace its pages with uploaded images and/or ZIP/CBZ
+        archives when there are any, otherwise apply `ordered_ids` (page ids) if given.
+        Raises ChapterUploadError, leaving the chapter untouched, when the upload is rejected.
+    """
+    manga = chapter.manga
+    if files:
+        # Store the new images (or archive) first, so a rejected upload leaves
+        # the chapter untouched; unchanged images are not stored again
+        try:
+            uploads = save_chapter_uploads(files)
+        except ChapterUploadError:
+            db.session.commit()  # keep rows for blobs already on disk, gc-blobs removes them
+            raise
+
+    chapter.title = title
+    chapter.number = number
+
+    new_pages, legacy_folder = [], None
+    if files:
+        # Old pages release their blobs; `flask gc-blobs` removes the unused files
+        new_pages = build_pages_from_blobs(chapter, uploads)
+        legacy_folder = chapter.content_path
+        chapter.content_path = None
+    elif ordered_ids:
+        reorder_chapter_pages(chapter, ordered_ids)
+
+    manga.chapters_changed()
+    db.session.commit()
+
+    # Chapters from before the blob store kept their pages in a folder of their own
+    if legacy_folder:
+        shutil.rmtree(os.path.join(current_app.root_path, legacy_folder), ignore_errors=True)
+    if new_pages:
+        schedule_page_derivatives(current_app._get_current_object(), new_pages)
+    return chapter
+
+
 # Delete Chapter
 @author_bp.route('/delete_chapter/<int:chapter_id>', methods=['POST'])
 @login_required
@@ -332,13 +508,14 @@ def delete_chapter(chapter_id):
         flash("You are not authorized to delete this chapter.", "danger")
         return redirect(url_for('author.view_chapters', manga_id=manga.id))
     
-    # Remove chapter folder and files
-    chapter_folder = os.path.join(current_app.root_path, chapter.content_path)
-    if os.path.exists(chapter_folder):
-        import shutil
-        shutil.rmtree(chapter_folder)
+    # Pages release their blobs with the chapter; only pre-blob chapters have a folder to remove
+    if chapter.content_path:
+        shutil.rmtree(os.path.join(current_app.root_path, chapter.content_path), ignore_errors=True)
 
     db.session.delete(chapter)
+    bump(Manga.comment_count, manga.id, -chapter.comment_count)  # its comments go with it
+    ReadingProgress.query.filter_by(chapter_id=chapter.id).update({ReadingProgress.chapter_id: None})
+    manga.chapters_changed()
     db.session.commit()
 
     flash('Chapter deleted successfully!', "success")
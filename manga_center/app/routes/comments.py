@@ -1,7 +1,10 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Comment, Chapter
+from app.models import Comment, Chapter, Manga
+from app.utils.comments import top_level_comment_page, reply_counts, COMMENTS_PAGE_SIZE
+from app.utils.counters import bump
 from datetime import datetime
 
 comment_bp = Blueprint('comments', __name__, url_prefix='/comments')
@@ -12,6 +15,68 @@ def fmt_dt(dt):
     return dt.strftime("%Y-%m-%d %H:%M") if dt else ''
 
 
+def comment_to_json(comment, reply_count=0):
+    """Shape of a comment in the lazy-loading endpoints."""
+    return {
+        'id': comment.id,
+        'user_id': comment.user_id,
+        'username': comment.user.username,
+        'content': comment.content,
+        'created_at': fmt_dt(comment.created_at),
+        'parent_id': comment.parent_id,
+        'reply_count': reply_count,
+    }
+
+
+def requested_limit():
+    """?limit= clamped to a sane page size."""
+    limit = request.args.get('limit', COMMENTS_PAGE_SIZE, type=int)
+    return max(1, min(limit, 50))
+
+
+# -------------------------------
+# LIST TOP-LEVEL COMMENTS (keyset pages)
+# -------------------------------
+@comment_bp.route('/<int:chapter_id>', methods=['GET'])
+def list_comments(chapter_id):
+    if not Chapter.query.get(chapter_id):
+        return jsonify(success=False, error='Chapter not found'), 404
+
+    comments, next_cursor = top_level_comment_page(
+        chapter_id, cursor=request.args.get('after'), limit=requested_limit()
+    )
+    counts = reply_counts([c.id for c in comments])
+
+    return jsonify(
+        success=True,
+        comments=[comment_to_json(c, counts.get(c.id, 0)) for c in comments],
+        next_cursor=next_cursor
+    )
+
+
+# -------------------------------
+# LIST REPLIES OF ONE COMMENT
+# -------------------------------
+@comment_bp.route('/<int:comment_id>/replies', methods=['GET'])
+def list_replies(comment_id):
+    if not Comment.query.get(comment_id):
+        return jsonify(success=False, error='Comment not found'), 404
+
+    replies = (
+        Comment.query.options(joinedload(Comment.user))
+        .filter_by(parent_id=comment_id)
+        .order_by(Comment.created_at.asc(), Comment.id.asc())
+        .all()
+    )
+    counts = reply_counts([r.id for r in replies])
+
+    return jsonify(
+        success=True,
+        comment_id=comment_id,
+        replies=[comment_to_json(r, counts.get(r.id, 0)) for r in replies]
+    )
+
+
 # -------------------------------
 # ADD COMMENT or REPLY
 # -------------------------------
@@ -48,6 +113,8 @@ def add_comment(chapter_id):
     )
 
     db.session.add(new_comment)
+    bump(Manga.comment_count, chapter.manga_id, +1)
+    bump(Chapter.comment_count, chapter.id, +1)
     db.session.commit()
 
     return jsonify(
@@ -105,13 +172,19 @@ def delete_comment(comment_id):
 
     # Delete all replies (recursive optional)
     def delete_with_replies(cmt):
+        deleted = 0
         replies = Comment.query.filter_by(parent_id=cmt.id).all()
         for r in replies:
-            delete_with_replies(r)
+            deleted += delete_with_replies(r)
             db.session.delete(r)
+            deleted += 1
+        return deleted
 
-    delete_with_replies(comment)
+    deleted = delete_with_replies(comment) + 1
     db.session.delete(comment)
+    bump(Manga.comment_count, comment.manga_id, -deleted)
+    if comment.chapter_id:
+        bump(Chapter.comment_count, comment.chapter_id, -deleted)
     db.session.commit()
 
     return jsonify(success=True, comment_id=comment_id)
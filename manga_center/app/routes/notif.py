@@ -1,38 +1,62 @@
 from flask import Blueprint, jsonify, request, render_template
 from flask_login import login_required, current_user
 from app import db
-from app.models import Notification
+from app.models import Notification, User
+from app.utils.counters import bump
+from app.utils.keyset import keyset_page
 
 notif_bp = Blueprint('notifications', __name__, url_prefix='/notifications')
 
+NOTIFICATIONS_PAGE_SIZE = 20
+
+
 # -----------------------------
-# Get all notifications (JSON or HTML)
+# Get one page of notifications (JSON or HTML)
 # -----------------------------
 @notif_bp.route('/', methods=['GET'])
 @login_required
 def get_notifications():
-    """Return all notifications for the logged-in user."""
-    notifications = (
-        Notification.query.filter_by(user_id=current_user.id)
-        .order_by(Notification.created_at.desc())
-        .all()
+    """Newest notifications of the logged-in user, one keyset page at a time (?after=<cursor>)."""
+    limit = max(1, min(request.args.get('limit', NOTIFICATIONS_PAGE_SIZE, type=int), 50))
+    # walks ix_notification_user_created, however long the history is
+    notifications, next_cursor = keyset_page(
+        Notification.query.filter_by(user_id=current_user.id),
+        [Notification.created_at, Notification.id],
+        cursor=request.args.get('after'),
+        limit=limit
     )
 
     # AJAX request → return JSON
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.args.get('ajax') == '1':
-        return jsonify([
-            {
-                'id': n.id,
-                'message': n.message,
-                'link': n.link,
-                'is_read': n.is_read,
-                'created_at': n.created_at.strftime('%Y-%m-%d %H:%M'),
-            }
-            for n in notifications
-        ])
+        return jsonify(
+            success=True,
+            notifications=[
+                {
+                    'id': n.id,
+                    'message': n.message,
+                    'link': n.link,
+                    'is_read': n.is_read,
+                    'created_at': n.created_at.strftime('%Y-%m-%d %H:%M'),
+                }
+                for n in notifications
+            ],
+            next_cursor=next_cursor,
+            unread=current_user.unread_notifications
+        )
 
     # Normal request → render HTML template
-    return render_template('all_notifications.html', notifications=notifications)
+    return render_template('all_notifications.html', notifications=notifications,
+                           next_cursor=next_cursor, is_first_page=not request.args.get('after'))
+
+
+# -----------------------------
+# Unread count (navbar badge polling)
+# -----------------------------
+@notif_bp.route('/unread_count', methods=['GET'])
+@login_required
+def unread_count():
+    # current_user is already loaded for the request: no extra query
+    return jsonify(success=True, unread=current_user.unread_notifications)
 
 
 # -----------------------------
@@ -45,7 +69,9 @@ def mark_notification_read(notif_id):
     if notif.user_id != current_user.id:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-    notif.is_read = True
+    # conditional update: marking twice must not count twice
+    updated = Notification.query.filter_by(id=notif_id, is_read=False).update({'is_read': True})
+    bump(User.unread_notifications, current_user.id, -updated)
     db.session.commit()
     return jsonify({'success': True, 'notif_id': notif_id})
 
@@ -56,7 +82,8 @@ def mark_notification_read(notif_id):
 @notif_bp.route('/mark_all_read', methods=['POST'])
 @login_required
 def mark_all_notifications_read():
-    Notification.query.filter_by(user_id=current_user.id, is_read=False).update({'is_read': True})
+    updated = Notification.query.filter_by(user_id=current_user.id, is_read=False).update({'is_read': True})
+    bump(User.unread_notifications, current_user.id, -updated)
     db.session.commit()
     return jsonify({'success': True})
 
@@ -71,6 +98,8 @@ def delete_notification(notif_id):
     if notif.user_id != current_user.id:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
+    if not notif.is_read:
+        bump(User.unread_notifications, current_user.id, -1)
     db.session.delete(notif)
     db.session.commit()
     return jsonify({'success': True, 'notif_id': notif_id})
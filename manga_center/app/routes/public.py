@@ -1,10 +1,20 @@
-from flask import Blueprint, render_template, redirect, url_for, abort, current_app, request
+from flask import Blueprint, render_template, redirect, url_for, abort, current_app, request, jsonify, make_response
 from flask_login import current_user
-from app.models import Manga, Chapter, Bookmark, Comment, Genre
+from app.models import Manga, Chapter, Bookmark, Comment, Genre, MangaSimilarity
 import os
 from app import db
 from app.forms.comment_form import CommentForm
-from sqlalchemy import func, desc
+from app.utils.chapter_pages import get_chapter_pages
+from app.utils.comments import top_level_comment_page, reply_counts
+from app.utils.search_index import search_matches
+from app.utils.chapter_toc import chapter_toc, chapter_neighbours, load_latest_chapters
+from app.utils.query_profiles import card_options, detail_options
+from app.utils.cbz import cbz_response
+from app.utils.reading_progress import progress_buffer
+from app.utils.view_counter import view_counter, is_prefetch
+from app.utils.chapter_manifest import chapter_manifest as build_chapter_manifest, preload_links
+from slugify import slugify
+from sqlalchemy import func, desc, false
 from datetime import datetime
 
 public_bp = Blueprint('public', __name__, url_prefix='/')
@@ -15,16 +25,16 @@ def index():
     page = request.args.get('page', 1, type=int)
     per_page = 20  # 4 per row × 5 rows
 
-    # Sort mangas by latest uploaded chapter
+    # Sort mangas by latest uploaded chapter (denormalized, indexed column).
+    # SQLite already sorts NULLs last on DESC, so manga without chapters
+    # end up at the back without defeating the index.
     mangas_query = (
-        db.session.query(Manga)
-        .outerjoin(Chapter)
-        .group_by(Manga.id)
-        .order_by(func.max(Chapter.upload_date).desc().nullslast())
+        Manga.query.options(*card_options())
+        .order_by(Manga.last_chapter_at.desc(), Manga.id.desc())
     )
 
     pagination = mangas_query.paginate(page=page, per_page=per_page, error_out=False)
-    mangas = pagination.items
+    mangas = load_latest_chapters(pagination.items, per_manga=2)
 
     return render_template('public/index.html', mangas=mangas, pagination=pagination)
 
@@ -32,14 +42,40 @@ def index():
 # View manga's details (cover, description, chapters)
 @public_bp.route('/manga/<int:manga_id>')
 def view_manga(manga_id):
-    manga = Manga.query.get_or_404(manga_id)
-    chapters = Chapter.query.filter_by(manga_id=manga_id).order_by(Chapter.number).all()
+    manga = Manga.query.options(*detail_options()).get_or_404(manga_id)
+    chapters = chapter_toc(manga)
+    if not is_prefetch(request):
+        view_counter.count(manga.id)
 
     is_bookmarked = False
+    continue_reading = None
     if current_user.is_authenticated:
         bookmark = Bookmark.query.filter_by(user_id=current_user.id, manga_id=manga_id).first()
         is_bookmarked = bookmark is not None
-    return render_template('public/view_manga.html', manga=manga, chapters=chapters, is_bookmarked=is_bookmarked)
+
+        # (TocEntry, page) of the chapter the user stopped in
+        progress = progress_buffer.get(current_user.id, manga_id)
+        if progress:
+            entry = next((c for c in chapters if c.id == progress[0]), None)
+            continue_reading = (entry, progress[1]) if entry else None
+
+    # Precomputed by `flask compute-similar`, one indexed lookup
+    similar_mangas = (
+        Manga.query.join(MangaSimilarity, MangaSimilarity.similar_id == Manga.id)
+        .filter(MangaSimilarity.manga_id == manga_id)
+        .order_by(MangaSimilarity.rank)
+        .limit(6)
+        .all()
+    )
+
+    return render_template(
+        'public/view_manga.html',
+        manga=manga,
+        chapters=chapters,
+        is_bookmarked=is_bookmarked,
+        continue_reading=continue_reading,
+        similar_mangas=similar_mangas
+    )
 
 # read specific chapter
 @public_bp.route('/read/<int:chapter_id>')
@@ -47,68 +83,121 @@ def read_chapter(chapter_id):
     chapter = Chapter.query.get_or_404(chapter_id)
     manga = chapter.manga
     
-    # top-level comments (no parent) ordered desc
-    top_comments = Comment.query.filter_by(
-        chapter_id=chapter_id, parent_id=None
-    ).order_by(Comment.created_at.desc()).all()
-
-    # For each top-level comment, fetch its replies ordered asc and attach to the object
-    for c in top_comments:
-        # Query replies for this comment, ordered by created_at ascending
-        replies = Comment.query.filter_by(parent_id=c.id).order_by(Comment.created_at.asc()).all()
-        # Attach prepared list to attribute used in template
-        c.replies_sorted = replies
-
-        # If you want deeper nesting (replies to replies), you can repeat recursively
-        # or build a recursive helper function to attach replies_sorted for each reply.
-
+    # First screen of top-level comments (desc) with their reply counts; older pages come
+    # from comment_bp.list_comments, replies from comment_bp.list_replies when opened
+    top_comments, comments_cursor = top_level_comment_page(chapter_id)
+    comment_reply_counts = reply_counts([c.id for c in top_comments])
 
     form = CommentForm()
 
-    # Get all chapters of this manga in order
-    chapters = Chapter.query.filter_by(manga_id=manga.id).order_by(Chapter.number).all()
-
-    # Find next and previous chapters
-    next_chapter = None
-    prev_chapter = None
-    for idx, ch in enumerate(chapters):
-        if ch.id == chapter.id:
-            if idx > 0:
-                prev_chapter = chapters[idx - 1]
-            if idx < len(chapters) - 1:
-                next_chapter = chapters[idx + 1]
-            break
-
-    # Build image URLs
-    chapter_folder = os.path.join(current_app.root_path, chapter.content_path)
-    if not os.path.exists(chapter_folder):
-        abort(404)
+    # Find next and previous chapters (indexed lookups, no full chapter list)
+    prev_chapter, next_chapter = chapter_neighbours(chapter)
 
-    image_files = sorted(
-        [f for f in os.listdir(chapter_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-    )
-    image_urls = [
-        url_for('static', filename=os.path.relpath(os.path.join(chapter.content_path, img), 'static').replace('\\', '/'))
-        for img in image_files
-    ]
+    # Build image URLs from the stored page manifest
+    pages = get_chapter_pages(current_app, chapter)
+    if pages is None:
+        abort(404)
 
-    return render_template(
+    # Reopening the chapter the user stopped in resumes at their page; any other chapter starts a new position.
+    # A speculative load is neither a view nor a new position.
+    resume_page = None
+    if not is_prefetch(request):
+        view_counter.count(manga.id, chapter.id)
+        if current_user.is_authenticated:
+            progress = progress_buffer.get(current_user.id, manga.id)
+            if progress and progress[0] == chapter.id:
+                resume_page = progress[1]
+            else:
+                progress_buffer.record(current_user.id, manga.id, chapter.id)
+
+    response = make_response(render_template(
         'public/read_chapter.html',
         manga=manga,
         chapter=chapter,
         comments=top_comments,
+        comments_cursor=comments_cursor,
+        reply_counts=comment_reply_counts,
         form=form,
-        image_urls=image_urls,
+        pages=pages,
+        resume_page=resume_page,
         next_chapter=next_chapter,
         prev_chapter=prev_chapter
-    )
+    ))
+    # Let the browser start on the first pages (and the next chapter) before the HTML arrives
+    links = preload_links(pages, next_chapter)
+    if links:
+        response.headers['Link'] = links
+    return response
+
+# Progress beacon from the reader: the page currently on screen (buffered, see utils.reading_progress)
+@public_bp.route('/read/<int:chapter_id>/progress', methods=['POST'])
+def save_progress(chapter_id):
+    if not current_user.is_authenticated:
+        return '', 401
+    page = request.form.get('page', type=int)
+    manga_id = db.session.query(Chapter.manga_id).filter(Chapter.id == chapter_id).scalar()
+    if manga_id is None or not page or page < 1:
+        return '', 400
+    progress_buffer.record(current_user.id, manga_id, chapter_id, page)
+    return '', 204
+
+# Chapter manifest (pages, sizes, neighbours) for the reader's next-chapter prefetch
+@public_bp.route('/read/<int:chapter_id>/manifest')
+def chapter_manifest(chapter_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    pages = get_chapter_pages(current_app, chapter)
+    if pages is None:
+        abort(404)
+    prev_chapter, next_chapter = chapter_neighbours(chapter)
+
+    response = jsonify(build_chapter_manifest(chapter, pages, prev_chapter, next_chapter))
+    # Short-lived: an edit changes the page list; the ETag makes revalidation cheap
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Download a chapter as CBZ
+@public_bp.route('/read/<int:chapter_id>/download')
+def download_chapter(chapter_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    manga = chapter.manga
+    if not get_chapter_pages(current_app, chapter):
+        abort(404)
+    return cbz_response(manga, [chapter], f"{slugify(manga.title)}-chapter-{chapter.number}.cbz")
+
+
+# Download a range of chapters (by number, inclusive; whole manga by default) as one CBZ
+@public_bp.route('/manga/<int:manga_id>/download')
+def download_manga(manga_id):
+    manga = Manga.query.get_or_404(manga_id)
+    first = request.args.get('from', type=int)
+    last = request.args.get('to', type=int)
+
+    query = Chapter.query.filter(Chapter.manga_id == manga.id)
+    if first is not None:
+        query = query.filter(Chapter.number >= first)
+    if last is not None:
+        query = query.filter(Chapter.number <= last)
+    chapters = [
+        chapter for chapter in query.order_by(Chapter.number, Chapter.id)
+        if get_chapter_pages(current_app, chapter)
+    ]
+    if not chapters:
+        abort(404)
+
+    name = f"{slugify(manga.title)}-chapters-{chapters[0].number}-{chapters[-1].number}.cbz"
+    return cbz_response(manga, chapters, name)
+
 
 @public_bp.route('/author/<int:author_id>')
 def view_author(author_id):
     from app.models import Author  # local import to avoid circular imports
 
     author = Author.query.get_or_404(author_id)
-    mangas = author.mangas  # all manga by this author
+    # all manga by this author
+    mangas = Manga.query.options(*card_options()).filter_by(author_id=author.id).order_by(Manga.id).all()
+    load_latest_chapters(mangas)
 
     return render_template('public/view_author.html', author=author, mangas=mangas)
 
@@ -120,11 +209,15 @@ def all_manga():
     author_filter = request.args.get('author', '').strip()
     page = request.args.get('page', 1, type=int)
 
-    mangas_query = Manga.query
+    mangas_query = Manga.query.options(*card_options())
 
     # --- Apply filters ---
     if search_query:
-        mangas_query = mangas_query.filter(Manga.title.ilike(f'%{search_query}%'))
+        matches = search_matches(search_query, columns=('title',))
+        if matches is None:
+            mangas_query = mangas_query.filter(false())
+        else:
+            mangas_query = mangas_query.join(matches, matches.c.manga_id == Manga.id)
 
     if author_filter:
         mangas_query = mangas_query.join(Author).filter(
@@ -137,7 +230,7 @@ def all_manga():
     # --- Pagination ---
     per_page = 6  # number of manga per page
     pagination = mangas_query.paginate(page=page, per_page=per_page, error_out=False)
-    mangas = pagination.items
+    mangas = load_latest_chapters(pagination.items)
 
     authors = Author.query.all()
 
@@ -150,12 +243,6 @@ def all_manga():
         pagination=pagination
     )
 
-@public_bp.route('/search')
-def search():
-    q = request.args.get('q', '')
-    mangas = Manga.query.filter(Manga.title.ilike(f"%{q}%")).all() if q else []
-    return render_template('public/search_results.html', mangas=mangas, query=q)
-
 #@public_bp.route('/genre/<genre_name>')
 #def genre(genre_name):
 #    page = request.args.get('page', 1, type=int)
@@ -174,7 +261,7 @@ def genre(genre_name):
     genre = Genre.query.filter_by(slug=genre_name).first_or_404()
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    mangas_query = genre.mangas.order_by(Manga.created_at.desc())
+    mangas_query = genre.mangas.options(*card_options()).order_by(Manga.created_at.desc())
     pagination = mangas_query.paginate(page=page, per_page=per_page, error_out=False)
-    mangas = pagination.items
+    mangas = load_latest_chapters(pagination.items)
     return render_template('public/genre.html', mangas=mangas, pagination=pagination, genre=genre)
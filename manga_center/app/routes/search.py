@@ -1,37 +1,36 @@
 from flask import Blueprint, request, render_template, jsonify
-from app.models import Manga, Author, Bookmark, Like
-from sqlalchemy import func
+from app.models import Manga
+from app.utils.search_index import search_manga_page, SEARCH_PAGE_SIZE
+from app.utils.chapter_toc import load_latest_chapters
+from app.utils.query_profiles import card_options
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search')
 def search():
     query = request.args.get('q', '').strip()
-    filter_type = request.args.get('filter', 'latest')
+    filter_type = request.args.get('filter') or ('relevance' if query else 'latest')
+    cursor = request.args.get('after')
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 60))
 
-    mangas = Manga.query.join(Author)
+    # One page of ids (FTS5 match + keyset on the chosen sort), cached for a few seconds
+    ids, next_cursor = search_manga_page(query, filter_type, cursor, limit)
 
-    # Basic text search
-    if query:
-        mangas = mangas.filter(
-            (Manga.title.ilike(f"%{query}%")) |
-            (Author.pen_name.ilike(f"%{query}%"))
-        )
-
-    # Sorting / filtering options
-    if filter_type == 'latest':
-        mangas = mangas.order_by(Manga.created_at.desc())
-    elif filter_type == 'bookmarked':
-        mangas = mangas.outerjoin(Bookmark).group_by(Manga.id).order_by(func.count(Bookmark.id).desc())
-    elif filter_type == 'liked':
-        mangas = mangas.outerjoin(Like).group_by(Manga.id).order_by(func.count(Like.id).desc())
-
-    mangas = mangas.all()
+    # Load the page's manga in one query, keeping the ranked order
+    by_id = {m.id: m for m in Manga.query.options(*card_options()).filter(Manga.id.in_(ids))} if ids else {}
+    mangas = load_latest_chapters(by_id[i] for i in ids if i in by_id)
 
     # If AJAX request, return only the rendered card list
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({
-            'html': render_template('partials/_manga_cards.html', mangas=mangas)
+            'html': render_template('partials/_manga_cards.html', mangas=mangas),
+            'next_cursor': next_cursor
         })
 
-    return render_template('search_results.html', mangas=mangas, query=query)
+    return render_template(
+        'public/search_results.html',
+        mangas=mangas,
+        query=query,
+        filter_type=filter_type,
+        next_cursor=next_cursor
+    )
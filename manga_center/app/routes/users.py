@@ -6,12 +6,17 @@ from flask_login import (
     login_user, logout_user, current_user, login_required
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
 from app import db
 from app.models import User, AuthorRequest, Bookmark, Manga
 from app.forms.login_form import LoginForm
 from app.forms.register_form import RegisterForm
 from app.forms.user_form import ProfileForm, AuthorRequestForm
+from app.utils.search_index import invalidate_search_results
+from app.utils.counters import bump
+from app.utils.chapter_toc import load_latest_chapters
+from app.utils.query_profiles import card_options
+from app.utils.thumbnails import make_thumbnails, PROFILE_PIC_SIZES
+from app.utils.blobs import store_upload
 import os
 
 users_bp = Blueprint('users', __name__)
@@ -108,18 +113,7 @@ def edit_profile():
 
         # Update profile picture
         if form.profile_pic.data:
-            pic_file = form.profile_pic.data
-            filename = secure_filename(f"user_{current_user.id}_{pic_file.filename}")
-
-            folder = current_app.config.get('PROFILE_PIC_FOLDER') or \
-                     os.path.join(current_app.root_path, 'static', 'uploads', 'profile_pics')
-            os.makedirs(folder, exist_ok=True)
-
-            file_path = os.path.join(folder, filename)
-            pic_file.save(file_path)
-
-            # Save relative path (for easy template usage)
-            current_user.profile_pic = os.path.relpath(file_path, current_app.root_path)
+            set_profile_pic(current_user, form.profile_pic.data)
 
         db.session.commit()
         flash('Your profile has been updated!', 'success')
@@ -127,6 +121,15 @@ def edit_profile():
 
     return render_template('edit_profile.html', form=form)
 
+
+def set_profile_pic(user, file):
+    """Store an uploaded profile picture in the blob store and build its variants (caller commits)."""
+    blob = store_upload(file)
+    user.profile_pic_blob_id = blob.id
+    # profile_pic stays relative to the app root, like the older per-user files
+    user.profile_pic = f"static/{blob.path}"
+    user.profile_pic_variants = make_thumbnails(os.path.join(current_app.static_folder, blob.path), PROFILE_PIC_SIZES)
+
 # ------------------------------------
 #               REQUEST AUTHOR
 # ------------------------------------
@@ -168,14 +171,19 @@ def toggle_bookmark(manga_id):
 
     if bookmark:
         db.session.delete(bookmark)
+        bump(Manga.bookmark_count, manga_id, -1)
         db.session.commit()
         action = "removed"
     else:
         new_bookmark = Bookmark(user_id=current_user.id, manga_id=manga_id)
         db.session.add(new_bookmark)
+        bump(Manga.bookmark_count, manga_id, +1)
         db.session.commit()
         action = "added"
 
+    # bookmark counts feed the 'Most Bookmarked' search order
+    invalidate_search_results()
+
     # If AJAX request, return JSON
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return jsonify({"status": "success", "action": action, "manga_id": manga_id})
@@ -193,13 +201,16 @@ def my_library():
     page = request.args.get('page', 1, type=int)
     per_page = 20  # 4 per row × 5 rows
 
-    pagination = Bookmark.query.filter_by(
+    pagination = Bookmark.query.options(
+        *card_options(via=Bookmark.manga)
+    ).filter_by(
         user_id=current_user.id
     ).order_by(
         Bookmark.created_at.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
 
     bookmarks = pagination.items
+    load_latest_chapters(b.manga for b in bookmarks)
 
     return render_template(
         'users/my_library.html',
@@ -0,0 +1,208 @@
+import glob
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Blob, ChapterPage, Manga, User, blob_path, BLOB_FOLDER
+from app.utils.chapter_pages import read_image_size
+from app.utils.derivatives import VARIANTS_FOLDER
+from app.utils.thumbnails import THUMBS_FOLDER
+
+# Content-addressed store for uploaded images: one file per distinct SHA-256
+# under static/uploads/blobs/ab/cd/<sha256><ext>, shared by every page, cover
+# and profile picture that uploads the same bytes. Blob.ref_count is kept by
+# mapper events in models.py; `flask gc-blobs` deletes blobs nobody references
+# any more.
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Unreferenced blobs younger than this are kept: their page/cover row may
+# still be on its way to the database
+GC_GRACE = timedelta(hours=1)
+
+
+def blob_root():
+    return os.path.join(current_app.static_folder, BLOB_FOLDER)
+
+
+class BlobWriter:
+    """
+        Write-only file object that hashes the bytes as they are written to a
+        temp file; save() then moves them into the store (or drops them when
+        the same content is already stored) and returns the Blob.
+        Used as a context manager, an unsaved temp file is always removed.
+    """
+
+    def __init__(self, ext):
+        self.ext = ext.lower()
+        tmp_folder = os.path.join(blob_root(), '.tmp')
+        os.makedirs(tmp_folder, exist_ok=True)
+        self.tmp_path = os.path.join(tmp_folder, uuid.uuid4().hex)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.tmp_path, 'wb')
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        self._file.write(data)
+        return len(data)
+
+    def save(self, validate=None):
+        """Store the content; `validate(tmp_path)` may raise to reject it first. Caller commits."""
+        self._file.close()
+        if validate:
+            validate(self.tmp_path)
+        sha256 = self._hash.hexdigest()
+
+        blob = Blob.query.filter_by(sha256=sha256).first()
+        if blob is not None:
+            # Claim the row before trusting its file: the UPDATE waits for a running
+            # collect_garbage and matches nothing if that deleted the row, while a
+            # fresh touched_at keeps any later collection away from it
+            claimed = Blob.query.filter_by(id=blob.id).update(
+                {Blob.touched_at: datetime.utcnow()}, synchronize_session=False
+            )
+            if not claimed:
+                db.session.expunge(blob)
+                blob = None
+
+        if blob is None:
+            final_path = os.path.join(current_app.static_folder, blob_path(sha256, self.ext))
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self.tmp_path, final_path)
+            width, height = read_image_size(final_path)
+            try:
+                with db.session.begin_nested():
+                    blob = Blob(sha256=sha256, ext=self.ext, size=self.size, width=width, height=height)
+                    db.session.add(blob)
+            except IntegrityError:
+                # the same content was stored concurrently, use that row
+                blob = Blob.query.filter_by(sha256=sha256).one()
+            blob.touched_at = datetime.utcnow()  # keeps a reused blob away from gc
+        else:
+            stored_path = os.path.join(current_app.static_folder, blob.path)
+            if os.path.exists(stored_path):
+                os.remove(self.tmp_path)
+            else:
+                # the row outlived its file; these bytes are the same content
+                os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+                os.replace(self.tmp_path, stored_path)
+        db.session.flush()
+        self.tmp_path = None
+        return blob
+
+    def discard(self):
+        self._file.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.discard()
+
+
+def store_stream(stream, ext, validate=None):
+    """Copy a readable stream into the store. Returns the Blob (caller commits)."""
+    with BlobWriter(ext) as writer:
+        shutil.copyfileobj(stream, writer, COPY_CHUNK_SIZE)
+        return writer.save(validate)
+
+
+def store_upload(file_storage, validate=None):
+    """Store an uploaded FileStorage, keeping its extension."""
+    ext = os.path.splitext(file_storage.filename or '')[1]
+    return store_stream(file_storage.stream, ext, validate)
+
+
+def store_file(path, validate=None):
+    """Store a file already on disk (used to migrate the old per-chapter folders)."""
+    with open(path, 'rb') as f:
+        return store_stream(f, os.path.splitext(path)[1], validate)
+
+
+# ---------------------------------
+#       GARBAGE COLLECTION
+# ---------------------------------
+def reconcile_blob_refs():
+    """Recompute Blob.ref_count from the rows pointing at blobs (caller commits)."""
+    page_refs = (
+        db.session.query(func.count(ChapterPage.id))
+        .filter(ChapterPage.blob_id == Blob.id)
+        .scalar_subquery()
+    )
+    cover_refs = (
+        db.session.query(func.count(Manga.id))
+        .filter(Manga.cover_blob_id == Blob.id)
+        .scalar_subquery()
+    )
+    profile_pic_refs = (
+        db.session.query(func.count(User.id))
+        .filter(User.profile_pic_blob_id == Blob.id)
+        .scalar_subquery()
+    )
+    Blob.query.update({Blob.ref_count: page_refs + cover_refs + profile_pic_refs}, synchronize_session=False)
+
+
+def blob_files(path, sha256):
+    """Absolute paths of a blob's file (static-relative `path`) and every derivative built from it."""
+    path = os.path.join(current_app.static_folder, path)
+    folder = os.path.dirname(path)
+    return [path] + glob.glob(os.path.join(folder, VARIANTS_FOLDER, f"{sha256}.*")) \
+        + glob.glob(os.path.join(folder, THUMBS_FOLDER, f"{sha256}.*"))
+
+
+def _rename_all(renames):
+    for source, target in renames:
+        try:
+            os.replace(source, target)
+        except FileNotFoundError:
+            pass
+
+
+def collect_garbage(grace=GC_GRACE):
+    """Delete unreferenced blobs not touched within `grace`. Returns (blobs, bytes) freed."""
+    cutoff = datetime.utcnow() - grace
+    removed, freed = 0, 0
+    candidates = [
+        (blob.id, blob.path, blob.sha256, blob.size or 0)
+        for blob in Blob.query.filter(Blob.ref_count <= 0, Blob.touched_at < cutoff)
+    ]
+    for blob_id, path, sha256, size in candidates:
+        # re-check in the DELETE itself, a page may have claimed the blob meanwhile
+        deleted = Blob.query.filter(
+            Blob.id == blob_id, Blob.ref_count <= 0, Blob.touched_at < cutoff
+        ).delete(synchronize_session=False)
+        if not deleted:
+            db.session.commit()
+            continue
+
+        # The DELETE holds SQLite's write lock until the commit, so a BlobWriter.save
+        # of the same content is waiting on its claim. Move the files out of the way
+        # under that lock: after the commit the paths belong to whichever upload
+        # recreates the blob.
+        tombstone = f".{uuid.uuid4().hex}.gc"
+        renames = [(file, file + tombstone) for file in blob_files(path, sha256)]
+        _rename_all(renames)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            _rename_all((target, source) for source, target in renames)
+            raise
+
+        for _, target in renames:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+        removed += 1
+        freed += size
+    return removed, freed
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+import uuid
+from flask import current_app
+
+MISSING = object()
+
+
+class VersionStamp:
+    """
+        Cross-worker "something changed" marker: a small file in the instance
+        folder rewritten on every bump(). Readers re-read it at most once per
+        `check_interval` seconds, so other workers notice a change within that delay.
+    """
+
+    def __init__(self, name, check_interval=1.0):
+        self.name = name
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = None
+
+    def _path(self):
+        return os.path.join(current_app.instance_path, f'{self.name}.version')
+
+    def current(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            try:
+                with open(self._path()) as f:
+                    self._version = f.read()
+            except FileNotFoundError:
+                self._version = ''
+            self._checked_at = now
+        return self._version
+
+    def bump(self):
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write + rename so readers never see a half-written stamp
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+        self._checked_at = None
+
+
+class TTLCache:
+    """
+        Small in-process cache: entries expire after `ttl` seconds and the
+        oldest entries are dropped once `maxsize` is reached. Thread-safe.
+        With a VersionStamp, invalidate() also empties the cache in other workers.
+        Only store plain data (ids, tuples), never ORM objects bound to a session.
+    """
+
+    def __init__(self, ttl, maxsize=1024, stamp=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stamp = stamp
+        self._seen_version = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _sync_with_stamp(self):
+        if self.stamp is None:
+            return
+        version = self.stamp.current()
+        if version != self._seen_version:
+            self._data.clear()
+            self._seen_version = version
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            self._sync_with_stamp()
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # dicts keep insertion order, so this drops the oldest entry
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self):
+        """Clear this worker's entries and tell the other workers to do the same."""
+        self.clear()
+        if self.stamp is not None:
+            self.stamp.bump()
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from flask import current_app, send_file, Response
+from sqlalchemy import func
+from app import db
+from app.models import Chapter
+from app.utils.chapter_pages import get_chapter_pages
+
+# CBZ downloads are plain ZIPs of the page images in STORED mode (images are
+# already compressed), built while they are sent. A finished archive is kept
+# in instance/cbz_cache/<content hash>.cbz and served from disk next time.
+CBZ_MIMETYPE = 'application/vnd.comicbook+zip'
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+COPY_CHUNK_SIZE = 256 * 1024
+
+# Bump when the archive layout or ComicInfo.xml changes, to orphan old cache entries
+CBZ_FORMAT = 1
+
+
+def cache_folder():
+    folder = os.path.join(current_app.instance_path, 'cbz_cache')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def comic_info(manga, chapters, page_count, chapter_count):
+    """ComicInfo.xml (the de-facto CBZ metadata schema) for one chapter or a range."""
+    root = ET.Element('ComicInfo')
+
+    def add(tag, value):
+        if value not in (None, ''):
+            ET.SubElement(root, tag).text = str(value)
+
+    first, last = chapters[0], chapters[-1]
+    add('Series', manga.title)
+    if len(chapters) == 1:
+        add('Title', first.title)
+        add('Number', first.number)
+    else:
+        add('Title', f"Chapters {first.number}-{last.number}")
+    add('Count', chapter_count)
+    add('Summary', manga.description)
+    add('Writer', manga.author.pen_name if manga.author else None)
+    add('Genre', manga.genre_names)
+    if last.upload_date:
+        add('Year', last.upload_date.year)
+        add('Month', last.upload_date.month)
+        add('Day', last.upload_date.day)
+    add('PageCount', page_count)
+    add('Manga', 'Yes')
+
+    ET.indent(root)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+
+def archive_entries(app, chapters):
+    """[(name inside the archive, absolute path, size)] in reading order; one folder per chapter for ranges."""
+    entries = []
+    for chapter in chapters:
+        for page in get_chapter_pages(app, chapter) or []:
+            ext = os.path.splitext(page.filename)[1].lower()
+            name = f"{page.number:04d}{ext}"
+            if len(chapters) > 1:
+                name = f"Chapter {chapter.number:04d}/{name}"
+            entries.append((name, os.path.join(app.static_folder, page.path), page.size))
+    return entries
+
+
+def content_hash(info_xml, entries):
+    """Changes whenever a page or anything written to ComicInfo.xml changes."""
+    digest = hashlib.sha256(f"cbz{CBZ_FORMAT}|".encode())
+    digest.update(info_xml)
+    for name, path, size in entries:
+        digest.update(f"|{name}:{path}:{size}".encode())
+    return digest.hexdigest()
+
+
+class _Sink:
+    """Write-only, unseekable file object for ZipFile; the generator drains it."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def stream_cbz(entries, info_xml, cache_path=None):
+    """
+        Generator of CBZ bytes; memory use is one copy chunk whatever the archive size.
+        With `cache_path`, the bytes are also written to a temp file that replaces
+        `cache_path` only once the archive is complete (not on client disconnect).
+    """
+    sink = _Sink()
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp" if cache_path else None
+    cache_file = open(tmp_path, 'wb') if tmp_path else None
+
+    def emit():
+        data = sink.drain()
+        if cache_file and data:
+            cache_file.write(data)
+        return data
+
+    completed = False
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr('ComicInfo.xml', info_xml)
+            yield emit()
+            for name, path, _size in entries:
+                with open(path, 'rb') as source, archive.open(name, 'w') as target:
+                    while chunk := source.read(COPY_CHUNK_SIZE):
+                        target.write(chunk)
+                        yield emit()
+        yield emit()  # central directory
+        completed = True
+    finally:
+        if cache_file:
+            cache_file.close()
+            if completed:
+                os.replace(tmp_path, cache_path)
+                prune_cache(os.path.dirname(cache_path))
+            else:
+                os.remove(tmp_path)
+
+
+def prune_cache(folder, max_bytes=CACHE_MAX_BYTES):
+    """Drop the least recently built/served archives until the cache fits in `max_bytes`."""
+    files = []
+    for name in os.listdir(folder):
+        if name.endswith('.cbz'):
+            stat = os.stat(os.path.join(folder, name))
+            files.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, name in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cbz_response(manga, chapters, download_name):
+    """Serve `chapters` of `manga` as a CBZ: from the disk cache, or streamed while it's built."""
+    app = current_app._get_current_object()
+    entries = archive_entries(app, chapters)
+    chapter_count = db.session.query(func.count(Chapter.id)).filter(Chapter.manga_id == manga.id).scalar()
+    # the XML is tiny; hashing it keys the cache on exactly the metadata in the archive
+    info_xml = comic_info(manga, chapters, len(entries), chapter_count)
+    cache_path = os.path.join(cache_folder(), f"{content_hash(info_xml, entries)}.cbz")
+
+    if os.path.exists(cache_path):
+        os.utime(cache_path)  # recently used, keep it through prune_cache
+        # send_file hands the open file to the server's file wrapper (sendfile)
+        return send_file(cache_path, mimetype=CBZ_MIMETYPE, as_attachment=True,
+                         download_name=download_name, conditional=True)
+
+    return Response(
+        stream_cbz(entries, info_xml, cache_path),
+        mimetype=CBZ_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
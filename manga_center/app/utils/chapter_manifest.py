@@ -0,0 +1,59 @@
+from flask import url_for
+
+# How many pages of a chapter the browser is told to fetch before it parses the HTML
+PRELOAD_PAGES = 3
+
+# Same `sizes` as the <source> in components/chapter_reader_layout.html, so a
+# preloaded variant is the one the page then picks
+PAGE_SIZES = "(max-width: 900px) 100vw, 900px"
+
+
+def page_entry(page):
+    return {
+        'number': page.number,
+        'url': page.url,
+        'srcset': page.srcset or None,
+        'width': page.width,
+        'height': page.height,
+    }
+
+
+def _neighbour(entry):
+    if entry is None:
+        return None
+    return {
+        'id': entry.id,
+        'number': entry.number,
+        'title': entry.title,
+        'url': url_for('public.read_chapter', chapter_id=entry.id),
+        'manifest': url_for('public.chapter_manifest', chapter_id=entry.id),
+    }
+
+
+def chapter_manifest(chapter, pages, prev_chapter, next_chapter):
+    """Everything the reader needs to show a chapter, without rendering its HTML."""
+    return {
+        'id': chapter.id,
+        'manga_id': chapter.manga_id,
+        'number': chapter.number,
+        'title': chapter.title,
+        'url': url_for('public.read_chapter', chapter_id=chapter.id),
+        'sizes': PAGE_SIZES,
+        'pages': [page_entry(page) for page in pages],
+        'prev': _neighbour(prev_chapter),
+        'next': _neighbour(next_chapter),
+    }
+
+
+def preload_links(pages, next_chapter=None, count=PRELOAD_PAGES):
+    """`Link` header value: preload the first pages, prefetch the next chapter's manifest."""
+    links = []
+    for page in pages[:count]:
+        link = f'<{page.url}>; rel=preload; as=image'
+        if page.srcset:
+            link += f'; type="image/webp"; imagesrcset="{page.srcset}"; imagesizes="{PAGE_SIZES}"'
+        links.append(link)
+    if next_chapter is not None:
+        manifest_url = url_for('public.chapter_manifest', chapter_id=next_chapter.id)
+        links.append(f'<{manifest_url}>; rel=prefetch; as=fetch; crossorigin=anonymous')
+    return ", ".join(links)
@@ -0,0 +1,100 @@
+import os
+from PIL import Image
+from app import db
+from app.models import ChapterPage
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+def read_image_size(file_path):
+    """Return (width, height) of an image, or (None, None) if it can't be read.
+    Pillow only parses the header here, the pixel data is never decoded."""
+    try:
+        with Image.open(file_path) as img:
+            return img.size
+    except (OSError, ValueError):
+        return None, None
+
+
+def list_chapter_images(chapter_folder):
+    """Sorted image filenames inside a chapter folder (legacy, pre-manifest order)."""
+    return sorted(f for f in os.listdir(chapter_folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def build_chapter_pages(app, chapter, filenames=None):
+    """
+        (Re)write the page manifest of a chapter.
+        `filenames` gives the reading order; when omitted the chapter folder is scanned.
+        Caller is responsible for committing.
+    """
+    chapter_folder = os.path.join(app.root_path, chapter.content_path)
+    if filenames is None:
+        filenames = list_chapter_images(chapter_folder)
+
+    pages = []
+    for number, filename in enumerate(filenames, start=1):
+        file_path = os.path.join(chapter_folder, filename)
+        width, height = read_image_size(file_path)
+        pages.append(ChapterPage(
+            number=number,
+            filename=filename,
+            path=os.path.relpath(os.path.join(chapter.content_path, filename), 'static').replace('\\', '/'),
+            size=os.path.getsize(file_path),
+            width=width,
+            height=height
+        ))
+
+    chapter.pages = pages
+    return pages
+
+
+def build_pages_from_blobs(chapter, uploads):
+    """
+        (Re)write the page manifest of a chapter from [(filename, Blob)] in reading order.
+        Pages point at the shared blob files. Caller is responsible for committing.
+    """
+    pages = [
+        ChapterPage(
+            number=number,
+            filename=filename,
+            path=blob.path,
+            size=blob.size,
+            width=blob.width,
+            height=blob.height,
+            blob_id=blob.id
+        )
+        for number, (filename, blob) in enumerate(uploads, start=1)
+    ]
+    chapter.pages = pages
+    return pages
+
+
+def get_chapter_pages(app, chapter):
+    """
+        Return the manifest of a chapter. Chapters uploaded before the manifest
+        existed are scanned once and persisted; returns None if their folder is gone.
+    """
+    if chapter.pages:
+        return chapter.pages
+
+    if not chapter.content_path:
+        return None
+    chapter_folder = os.path.join(app.root_path, chapter.content_path)
+    if not os.path.exists(chapter_folder):
+        return None
+
+    pages = build_chapter_pages(app, chapter)
+    db.session.commit()
+    return pages
+
+
+def reorder_chapter_pages(chapter, ordered_ids):
+    """Apply a new page order coming from the edit form (list of ChapterPage ids;
+    URLs can repeat now that identical images share one blob)."""
+    by_id = {page.id: page for page in chapter.pages}
+    ordered = [by_id.pop(page_id) for page_id in ordered_ids if page_id in by_id]
+    # Pages missing from the submitted order keep their relative position at the end
+    ordered += sorted(by_id.values(), key=lambda p: p.number)
+
+    for number, page in enumerate(ordered, start=1):
+        page.number = number
@@ -0,0 +1,85 @@
+from collections import namedtuple
+from sqlalchemy import tuple_, func
+from app import db
+from app.models import Chapter
+from app.utils.cache import TTLCache
+
+# Compact, session-free view of one chapter for lists and navigation
+TocEntry = namedtuple('TocEntry', 'id number title upload_date')
+
+# Keyed by (manga_id, manga.toc_version): a chapter change bumps the version in the
+# database, so every worker misses its stale entry without explicit invalidation.
+toc_cache = TTLCache(ttl=600, maxsize=512)
+
+
+def chapter_toc(manga):
+    """All chapters of a manga ordered by number, as a tuple of TocEntry."""
+    key = (manga.id, manga.toc_version)
+    toc = toc_cache.get(key, None)
+    if toc is None:
+        rows = (
+            db.session.query(Chapter.id, Chapter.number, Chapter.title, Chapter.upload_date)
+            .filter(Chapter.manga_id == manga.id)
+            .order_by(Chapter.number, Chapter.id)
+            .all()
+        )
+        toc = tuple(TocEntry(*row) for row in rows)
+        toc_cache.set(key, toc)
+    return toc
+
+
+def chapter_neighbours(chapter):
+    """(previous, next) chapters by number as TocEntry or None, via the (manga_id, number) index."""
+    columns = (Chapter.id, Chapter.number, Chapter.title, Chapter.upload_date)
+    position = tuple_(Chapter.number, Chapter.id)
+    current = tuple_(chapter.number, chapter.id)
+
+    prev_row = (
+        db.session.query(*columns)
+        .filter(Chapter.manga_id == chapter.manga_id, position < current)
+        .order_by(Chapter.number.desc(), Chapter.id.desc())
+        .first()
+    )
+    next_row = (
+        db.session.query(*columns)
+        .filter(Chapter.manga_id == chapter.manga_id, position > current)
+        .order_by(Chapter.number, Chapter.id)
+        .first()
+    )
+    return (TocEntry(*prev_row) if prev_row else None,
+            TocEntry(*next_row) if next_row else None)
+
+
+def load_latest_chapters(mangas, per_manga=1):
+    """
+        Preload the newest `per_manga` chapters of every manga in a page with one
+        ROW_NUMBER() window query. Sets `manga.latest_chapters` (newest first,
+        TocEntry), which Manga.latest_chapter_title also reads. Returns `mangas`.
+    """
+    mangas = list(mangas)
+    if not mangas:
+        return mangas
+
+    position = func.row_number().over(
+        partition_by=Chapter.manga_id,
+        order_by=(Chapter.upload_date.desc(), Chapter.id.desc())
+    ).label('position')
+    ranked = (
+        db.session.query(Chapter.id, Chapter.manga_id, Chapter.number, Chapter.title,
+                         Chapter.upload_date, position)
+        .filter(Chapter.manga_id.in_({m.id for m in mangas}))
+        .subquery()
+    )
+    rows = (
+        db.session.query(ranked.c.manga_id, ranked.c.id, ranked.c.number, ranked.c.title, ranked.c.upload_date)
+        .filter(ranked.c.position <= per_manga)
+        .order_by(ranked.c.manga_id, ranked.c.position)
+        .all()
+    )
+
+    latest = {m.id: [] for m in mangas}
+    for manga_id, *entry in rows:
+        latest[manga_id].append(TocEntry(*entry))
+    for manga in mangas:
+        manga.latest_chapters = latest[manga.id]
+    return mangas
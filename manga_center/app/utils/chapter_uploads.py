@@ -0,0 +1,131 @@
+import os
+import re
+import zipfile
+from werkzeug.utils import secure_filename
+from app.utils.chapter_pages import IMAGE_EXTENSIONS, read_image_size
+from app.utils.blobs import BlobWriter, store_upload
+
+ARCHIVE_EXTENSIONS = ('.zip', '.cbz')
+
+# Zip-bomb guards, checked on the central directory first and again while
+# streaming (declared sizes can lie)
+MAX_ARCHIVE_ENTRIES = 1000
+MAX_ENTRY_SIZE = 50 * 1024 * 1024           # 50MB per page
+MAX_ARCHIVE_SIZE = 1024 * 1024 * 1024       # 1GB extracted per archive
+MAX_COMPRESSION_RATIO = 100
+
+# Entries that CBZ/ZIP tools add and that are silently skipped
+IGNORED_ENTRIES = ('comicinfo.xml', 'thumbs.db', 'desktop.ini')
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class ChapterUploadError(ValueError):
+    """An uploaded page or archive was rejected; the message is shown to the author."""
+
+
+def natural_key(name):
+    """Sort key that orders "page2" before "page10"."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name.lower())]
+
+
+def _is_ignored(name):
+    basename = os.path.basename(name.rstrip('/'))
+    return (
+        name.startswith('__MACOSX/')
+        or basename.startswith('.')
+        or basename.lower() in IGNORED_ENTRIES
+    )
+
+
+def _archive_pages(archive):
+    """Image entries of an archive in reading order, after checking the declared sizes."""
+    entries = [info for info in archive.infolist() if not info.is_dir() and not _is_ignored(info.filename)]
+    if len(entries) > MAX_ARCHIVE_ENTRIES:
+        raise ChapterUploadError(f"Archive has more than {MAX_ARCHIVE_ENTRIES} files.")
+
+    total = 0
+    for info in entries:
+        if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+            raise ChapterUploadError(f"'{info.filename}' in the archive is not an image.")
+        if info.file_size > MAX_ENTRY_SIZE:
+            raise ChapterUploadError(f"'{info.filename}' is too large.")
+        if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+            raise ChapterUploadError(f"'{info.filename}' is compressed suspiciously well.")
+        total += info.file_size
+    if total > MAX_ARCHIVE_SIZE:
+        raise ChapterUploadError("Archive is too large once extracted.")
+
+    return sorted(entries, key=lambda info: natural_key(info.filename))
+
+
+def _copy_limited(source, target, limit):
+    """copyfileobj that stops once more than `limit` bytes came out of the archive."""
+    written = 0
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return written
+        written += len(chunk)
+        if written > limit:
+            raise ChapterUploadError("Archive contents don't match their declared size.")
+        target.write(chunk)
+
+
+def _image_validator(label):
+    """BlobWriter.save() hook: refuse content Pillow can't read."""
+    def validate(file_path):
+        width, _ = read_image_size(file_path)
+        if width is None:
+            raise ChapterUploadError(f"'{label}' is not a readable image.")
+    return validate
+
+
+def extract_chapter_archive(stream):
+    """
+        Stream the pages of a ZIP/CBZ into the blob store, one entry at a time.
+        `stream` must be seekable (uploads are spooled to disk).
+        Returns [(filename, Blob)] in reading order.
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ChapterUploadError("Archive is not a valid ZIP/CBZ file.")
+
+    saved = []
+    with archive:
+        for info in _archive_pages(archive):
+            filename = secure_filename(os.path.basename(info.filename))
+            try:
+                with archive.open(info) as source, BlobWriter(os.path.splitext(filename)[1]) as target:
+                    _copy_limited(source, target, info.file_size)
+                    blob = target.save(validate=_image_validator(info.filename))
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                # corrupt entry, encrypted entry or unsupported compression
+                raise ChapterUploadError(f"Could not extract '{info.filename}': {e}")
+            saved.append((filename, blob))
+    return saved
+
+
+def save_chapter_uploads(files):
+    """
+        Store the uploaded pages of a chapter: loose images are kept in upload order,
+        ZIP/CBZ archives add their pages where they appear. Content goes to the
+        blob store, already-known images are not stored twice.
+        Returns [(filename, Blob)] in reading order; raises ChapterUploadError.
+        Blobs stored before a rejection stay unreferenced until `flask gc-blobs`.
+    """
+    saved = []
+    for file in files:
+        if not file or not file.filename:
+            continue
+        filename = secure_filename(file.filename)
+        ext = os.path.splitext(filename)[1].lower()
+
+        if ext in ARCHIVE_EXTENSIONS:
+            saved += extract_chapter_archive(file.stream)
+        elif ext in IMAGE_EXTENSIONS:
+            saved.append((filename, store_upload(file, validate=_image_validator(file.filename))))
+        else:
+            raise ChapterUploadError(f"'{file.filename}' is not an image or a ZIP/CBZ archive.")
+    return saved
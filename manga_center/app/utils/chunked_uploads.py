@@ -0,0 +1,133 @@
+import json
+import os
+import re
+import time
+import uuid
+from flask import current_app
+
+# Resumable uploads for files larger than MAX_CONTENT_LENGTH.
+# Each upload is three files in instance/chunked_uploads/:
+#   <id>.json    who/what/how big (written once by start_upload)
+#   <id>.part    the file itself, preallocated; chunks land with os.pwrite
+#   <id>.chunks  one byte per chunk, set to 1 once that chunk is stored
+# Chunks are written in place, so retries and parallel PUTs need no locking.
+CHUNK_SIZE = 1024 * 1024                    # must stay below MAX_CONTENT_LENGTH
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024        # 1GB per file
+UPLOAD_EXPIRY = 24 * 60 * 60                # seconds since the last chunk
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChunkedUploadError(ValueError):
+    """Bad chunked-upload request; the message goes back to the client."""
+
+
+def uploads_folder():
+    folder = os.path.join(current_app.instance_path, 'chunked_uploads')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _path(upload_id, suffix):
+    return os.path.join(uploads_folder(), f"{upload_id}{suffix}")
+
+
+def chunk_count(size):
+    return max(1, -(-size // CHUNK_SIZE))
+
+
+def start_upload(user_id, manga_id, filename, size):
+    """Register a new upload and preallocate its file. Returns the upload metadata."""
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise ChunkedUploadError("File size is missing or too large.")
+
+    cleanup_expired_uploads()
+
+    upload = {
+        'id': uuid.uuid4().hex,
+        'user_id': user_id,
+        'manga_id': manga_id,
+        'filename': filename,
+        'size': size,
+        'chunk_size': CHUNK_SIZE,
+    }
+    with open(_path(upload['id'], '.part'), 'wb') as f:
+        f.truncate(size)  # sparse on most filesystems
+    with open(_path(upload['id'], '.chunks'), 'wb') as f:
+        f.write(bytes(chunk_count(size)))
+    with open(_path(upload['id'], '.json'), 'w') as f:
+        json.dump(upload, f)
+    return upload
+
+
+def get_upload(upload_id, user_id):
+    """Metadata of an upload owned by `user_id`, or None if unknown or expired."""
+    if not _UPLOAD_ID.match(upload_id or ''):
+        return None
+    try:
+        with open(_path(upload_id, '.json')) as f:
+            upload = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return upload if upload['user_id'] == user_id else None
+
+
+def write_chunk(upload, offset, data):
+    """Store one chunk at `offset`. Idempotent: re-sending a chunk overwrites it with itself."""
+    size, chunk_size = upload['size'], upload['chunk_size']
+    if offset < 0 or offset >= size or offset % chunk_size:
+        raise ChunkedUploadError("Offset must be a chunk boundary inside the file.")
+    if len(data) != min(chunk_size, size - offset):
+        raise ChunkedUploadError("Chunk has the wrong length.")
+
+    fd = os.open(_path(upload['id'], '.part'), os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+
+    # Mark the chunk only after its bytes are written
+    fd = os.open(_path(upload['id'], '.chunks'), os.O_WRONLY)
+    try:
+        os.pwrite(fd, b'\x01', offset // chunk_size)
+    finally:
+        os.close(fd)
+
+
+def missing_chunks(upload):
+    """Offsets still to be sent, so an interrupted client can resume."""
+    with open(_path(upload['id'], '.chunks'), 'rb') as f:
+        received = f.read()
+    return [i * upload['chunk_size'] for i, done in enumerate(received) if not done]
+
+
+def open_upload(upload):
+    """Open the assembled file for reading; only valid once missing_chunks() is empty."""
+    return open(_path(upload['id'], '.part'), 'rb')
+
+
+def discard_upload(upload_id):
+    for suffix in ('.json', '.part', '.chunks'):
+        try:
+            os.remove(_path(upload_id, suffix))
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_expired_uploads(max_age=UPLOAD_EXPIRY):
+    """Delete uploads with no chunk written for `max_age` seconds. Returns how many were removed."""
+    now = time.time()
+    removed = 0
+    # group by id, so leftovers of a half-started upload are collected too
+    upload_ids = {os.path.splitext(name)[0] for name in os.listdir(uploads_folder())}
+    for upload_id in upload_ids:
+        mtimes = []
+        for suffix in ('.json', '.part', '.chunks'):
+            try:
+                mtimes.append(os.path.getmtime(_path(upload_id, suffix)))
+            except FileNotFoundError:
+                pass
+        if not mtimes or now - max(mtimes) > max_age:
+            discard_upload(upload_id)
+            removed += 1
+    return removed
@@ -0,0 +1,26 @@
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Comment
+from app.utils.keyset import keyset_page
+
+COMMENTS_PAGE_SIZE = 20
+
+
+def top_level_comment_page(chapter_id, cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """One keyset page of top-level comments, newest first. Returns (comments, next_cursor)."""
+    query = Comment.query.options(joinedload(Comment.user)).filter_by(chapter_id=chapter_id, parent_id=None)
+    return keyset_page(query, [Comment.created_at, Comment.id], cursor, limit)
+
+
+def reply_counts(comment_ids):
+    """Map comment id -> number of direct replies, in one grouped query."""
+    if not comment_ids:
+        return {}
+    rows = (
+        db.session.query(Comment.parent_id, func.count(Comment.id))
+        .filter(Comment.parent_id.in_(comment_ids))
+        .group_by(Comment.parent_id)
+        .all()
+    )
+    return dict(rows)
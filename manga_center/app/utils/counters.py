@@ -0,0 +1,48 @@
+from sqlalchemy import func, select
+from app import db
+from app.models import Manga, Chapter, Bookmark, Like, Comment, User, Notification
+
+
+def bump(column, row_id, delta=1):
+    """
+        Atomic `UPDATE ... SET column = column + delta` for one row, in the
+        caller's transaction (caller commits).
+    """
+    model = column.class_
+    model.query.filter(model.id == row_id).update(
+        {column: column + delta}, synchronize_session=False
+    )
+
+
+def _count(model, fk_column, owner):
+    return (
+        select(func.count(model.id))
+        .where(fk_column == owner.id)
+        .correlate(owner)
+        .scalar_subquery()
+    )
+
+
+def reconcile_counters():
+    """Recompute every counter column from Bookmark, Like, Comment and Notification."""
+    Manga.query.update({
+        Manga.bookmark_count: _count(Bookmark, Bookmark.manga_id, Manga),
+        Manga.like_count: _count(Like, Like.manga_id, Manga),
+        Manga.comment_count: _count(Comment, Comment.manga_id, Manga),
+    }, synchronize_session=False)
+
+    Chapter.query.update({
+        Chapter.like_count: _count(Like, Like.chapter_id, Chapter),
+        Chapter.comment_count: _count(Comment, Comment.chapter_id, Chapter),
+    }, synchronize_session=False)
+
+    User.query.update({
+        User.unread_notifications: (
+            select(func.count(Notification.id))
+            .where(Notification.user_id == User.id, Notification.is_read.is_(False))
+            .correlate(User)
+            .scalar_subquery()
+        ),
+    }, synchronize_session=False)
+
+    db.session.commit()
@@ -0,0 +1,118 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from app import db
+from app.models import ChapterPage
+
+# Reader widths (px). Each page also gets a WebP at its own width; widths at or
+# above the original are skipped, pages are never upscaled.
+PAGE_WIDTHS = (480, 960, 1440)
+WEBP_QUALITY = 80
+
+# Derivatives live next to the originals, in a subfolder of the blob's folder
+VARIANTS_FOLDER = '_variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool shared by the whole worker, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+        return _executor
+
+
+def render_page_variants(source_path, widths=PAGE_WIDTHS, quality=WEBP_QUALITY, overwrite=False):
+    """
+        Resize and re-encode one page as WebP. Runs in a pool process, so it only
+        touches files: returns [(filename, width, height)] for the caller to record.
+        Blobs are shared between pages, so variants already on disk are reused
+        unless `overwrite` is set.
+    """
+    folder, filename = os.path.split(source_path)
+    stem = os.path.splitext(filename)[0]
+    out_folder = os.path.join(folder, VARIANTS_FOLDER)
+    os.makedirs(out_folder, exist_ok=True)
+
+    variants = []
+    with Image.open(source_path) as img:
+        decoded = None  # pixels are only decoded if some variant is missing
+        targets = [w for w in widths if w < img.width] + [img.width]
+        for width in targets:
+            height = round(img.height * width / img.width)
+            out_name = f"{stem}.{width}.webp"
+            out_path = os.path.join(out_folder, out_name)
+            if overwrite or not os.path.exists(out_path):
+                if decoded is None:
+                    img.load()
+                    decoded = img
+                    if img.mode not in ('RGB', 'RGBA'):
+                        decoded = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+                resized = decoded if width == img.width else decoded.resize((width, height), Image.LANCZOS)
+                resized.save(out_path, 'WEBP', quality=quality, method=4)
+            variants.append((out_name, width, height))
+    return variants
+
+
+def variant_records(page_path, rendered):
+    """JSON stored in ChapterPage.variants: static-relative path, size and type of each derivative."""
+    folder = os.path.dirname(page_path)
+    return [
+        {'path': f"{folder}/{VARIANTS_FOLDER}/{name}", 'width': width, 'height': height, 'type': 'image/webp'}
+        for name, width, height in rendered
+    ]
+
+
+def _record_variants(app, page_id, page_path, future):
+    """Done-callback (pool thread of the web worker): store the finished variants on the page."""
+    try:
+        rendered = future.result()
+    except Exception:
+        app.logger.exception("Building derivatives for page %s failed", page_id)
+        return
+
+    with app.app_context():
+        page = db.session.get(ChapterPage, page_id)
+        # the chapter may have been re-uploaded meanwhile; its new pages get their own jobs
+        if page is None or page.path != page_path:
+            return
+        page.variants = variant_records(page_path, rendered)
+        db.session.commit()
+
+
+def schedule_page_derivatives(app, pages):
+    """
+        Queue derivative builds for `pages` (already committed) and return at once;
+        each page's `variants` is filled in when its job finishes.
+    """
+    executor = get_executor()
+    static_folder = app.static_folder
+    for page in pages:
+        source_path = os.path.join(static_folder, page.path)
+        future = executor.submit(render_page_variants, source_path)
+        future.add_done_callback(
+            lambda f, page_id=page.id, page_path=page.path: _record_variants(app, page_id, page_path, f)
+        )
+
+
+def build_page_derivatives(app, pages, overwrite=False):
+    """Synchronous variant for the CLI backfill: build on the pool and wait. Caller commits."""
+    executor = get_executor()
+    jobs = [(page, executor.submit(render_page_variants, os.path.join(app.static_folder, page.path),
+                                   overwrite=overwrite))
+            for page in pages]
+
+    built = 0
+    for page, future in jobs:
+        try:
+            rendered = future.result()
+        except Exception as e:
+            app.logger.warning("Skipping page %s: %s", page.id, e)
+            continue
+        page.variants = variant_records(page.path, rendered)
+        built += 1
+    return built
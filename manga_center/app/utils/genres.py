@@ -0,0 +1,22 @@
+from collections import namedtuple
+from app.models import Genre
+from app.utils.cache import TTLCache, VersionStamp
+
+# Plain tuples, safe to share between requests (no session attached)
+GenreItem = namedtuple('GenreItem', 'id name slug')
+
+genre_cache = TTLCache(ttl=3600, maxsize=1, stamp=VersionStamp('genres'))
+
+
+def cached_genres():
+    """All genres ordered by name, from memory unless an admin changed them."""
+    genres = genre_cache.get('all', None)
+    if genres is None:
+        genres = [GenreItem(g.id, g.name, g.slug) for g in Genre.query.order_by(Genre.name)]
+        genre_cache.set('all', genres)
+    return genres
+
+
+def invalidate_genres():
+    """Call after adding or deleting a genre (in every worker, via the version stamp)."""
+    genre_cache.invalidate()
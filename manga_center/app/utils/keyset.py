@@ -0,0 +1,52 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(*values):
+    """Pack the sort key of the last row of a page into an opaque URL-safe cursor."""
+    packed = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(packed, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Unpack a cursor made by encode_cursor. Returns None for missing or tampered cursors."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        packed = json.loads(raw)
+        values = [
+            datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v
+            for v in packed
+        ]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if len(values) != size:
+        return None
+    return values
+
+
+def keyset_page(query, columns, cursor=None, limit=20, key=None):
+    """
+        Fetch one page of `query` sorted DESC on `columns` (last one must be unique, e.g. id).
+        `key` extracts the sort values from a result row; by default they are read
+        as attributes named after the columns.
+        Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    values = decode_cursor(cursor, len(columns))
+    if values is not None:
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    rows = query.order_by(*[c.desc() for c in columns]).limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        sort_values = key(last) if key else [getattr(last, c.key) for c in columns]
+        next_cursor = encode_cursor(*sort_values)
+    return items, next_cursor
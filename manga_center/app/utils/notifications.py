@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, insert, literal, update
+from app import db
+from app.models import Notification, Bookmark, Chapter, Manga, Author, User
+
+# New-chapter notifications go to every bookmarker of the manga. Popular series
+# have 100k+ of them, so the upload request only marks the chapter (notify_cursor
+# = 0) and queues it; a background thread then copies bookmarkers into
+# Notification FANOUT_BATCH rows at a time with INSERT ... SELECT, walking
+# Bookmark.id. Each batch commits together with the cursor, so a fan-out cut
+# short by a restart resumes where it stopped (`flask resume-notifications`).
+FANOUT_BATCH = 5000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Single worker thread: fan-outs run one at a time, SQLite has one writer anyway."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+        return _executor
+
+
+def new_chapter_message(manga, chapter):
+    return f"New chapter of {manga.title}: Chapter {chapter.number} - {chapter.title}"[:255]
+
+
+def _reader_link(chapter_id):
+    # no request in the worker thread; in-site links only need the path
+    return current_app.url_map.bind('').build('public.read_chapter', {'chapter_id': chapter_id})
+
+
+def fan_out_new_chapter(chapter_id, batch_size=FANOUT_BATCH):
+    """Notify the bookmarkers of a chapter's manga, resuming from chapter.notify_cursor. Returns rows inserted."""
+    chapter = db.session.get(Chapter, chapter_id)
+    if chapter is None or chapter.notify_cursor is None:
+        return 0
+    manga = db.session.get(Manga, chapter.manga_id)
+    author_user_id = db.session.query(Author.user_id).filter(Author.id == manga.author_id).scalar()
+
+    message = new_chapter_message(manga, chapter)
+    link = _reader_link(chapter.id)
+    now = datetime.utcnow()
+    cursor = chapter.notify_cursor
+    sent = 0
+
+    while True:
+        # upper bound of this batch: the batch_size-th bookmark after the cursor
+        upper = (
+            db.session.query(Bookmark.id)
+            .filter(Bookmark.manga_id == manga.id, Bookmark.id > cursor)
+            .order_by(Bookmark.id)
+            .offset(batch_size - 1)
+            .limit(1)
+            .scalar()
+        )
+        in_batch = [Bookmark.manga_id == manga.id, Bookmark.id > cursor]
+        if upper is not None:
+            in_batch.append(Bookmark.id <= upper)
+        if author_user_id is not None:
+            in_batch.append(Bookmark.user_id != author_user_id)
+
+        result = db.session.execute(
+            insert(Notification).from_select(
+                ['user_id', 'is_read', 'message', 'link', 'created_at'],
+                select(Bookmark.user_id, literal(False), literal(message), literal(link), literal(now))
+                .where(*in_batch)
+            )
+        )
+        sent += result.rowcount
+        # one notification per bookmarker (Bookmark is unique per user and manga)
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(select(Bookmark.user_id).where(*in_batch)))
+            .values(unread_notifications=User.unread_notifications + 1)
+        )
+
+        # NULL marks the fan-out done; committed with the batch, so no batch is sent twice
+        cursor = upper
+        db.session.execute(
+            update(Chapter).where(Chapter.id == chapter.id).values(notify_cursor=cursor)
+        )
+        db.session.commit()
+        if upper is None:
+            return sent
+
+
+def _run_fan_out(app, chapter_id):
+    with app.app_context():
+        try:
+            sent = fan_out_new_chapter(chapter_id)
+            app.logger.info("Sent %s new-chapter notifications for chapter %s", sent, chapter_id)
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("New-chapter fan-out for chapter %s failed", chapter_id)
+        finally:
+            db.session.remove()
+
+
+def schedule_new_chapter_notifications(app, chapter):
+    """Queue the fan-out of a chapter committed with notify_cursor = 0; returns at once."""
+    get_executor().submit(_run_fan_out, app, chapter.id)
+
+
+def resume_fan_outs():
+    """Run every fan-out left unfinished (queued or interrupted) in this process. Returns rows inserted."""
+    chapter_ids = [
+        chapter_id for (chapter_id,) in
+        db.session.query(Chapter.id).filter(Chapter.notify_cursor.isnot(None)).order_by(Chapter.id)
+    ]
+    return sum(fan_out_new_chapter(chapter_id) for chapter_id in chapter_ids)
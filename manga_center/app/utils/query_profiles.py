@@ -0,0 +1,31 @@
+from sqlalchemy.orm import Load, joinedload, selectinload
+from app.models import Manga, Author
+
+
+# Loader options per rendering context, so templates touching
+# manga.author / manga.genres don't lazy-load once per row.
+# The latest chapter is not a relationship: pair card_options() with
+# utils.chapter_toc.load_latest_chapters on the page's items.
+
+def _manga_path(via):
+    """Start the loader chain at Manga, or at a relationship leading to it (e.g. Bookmark.manga)."""
+    return joinedload(via) if via is not None else Load(Manga)
+
+
+def card_options(via=None):
+    """
+        Card grids: author (+ user for the username fallback) joined in the same
+        query, genres in one extra SELECT ... IN for the whole page.
+    """
+    return (
+        _manga_path(via).joinedload(Manga.author).joinedload(Author.user),
+        _manga_path(via).selectinload(Manga.genres),
+    )
+
+
+def detail_options():
+    """Single manga page: everything in one query, there is only one row to widen."""
+    return (
+        Load(Manga).joinedload(Manga.author).joinedload(Author.user),
+        Load(Manga).joinedload(Manga.genres),
+    )
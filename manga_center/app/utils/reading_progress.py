@@ -0,0 +1,79 @@
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models import ReadingProgress, Manga
+from app.utils.write_behind import WriteBehindBuffer
+
+# Reading progress changes on every page scroll, so it is written behind:
+# record() only updates an in-process dict keyed by (user_id, manga_id), and
+# a flusher thread writes everything pending as one batched upsert every
+# FLUSH_INTERVAL seconds (sooner once MAX_PENDING users are waiting, and at exit).
+FLUSH_INTERVAL = 5.0
+MAX_PENDING = 1000
+
+
+class ProgressBuffer(WriteBehindBuffer):
+    """Coalescing write-behind buffer for ReadingProgress, one per worker process."""
+
+    name = 'reading-progress'
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        super().__init__(interval, max_pending)
+        self._pending = {}
+
+    def record(self, user_id, manga_id, chapter_id, page=1):
+        """Remember the latest position; only the newest one per (user, manga) reaches the database."""
+        with self._lock:
+            self._pending[(user_id, manga_id)] = (chapter_id, page, datetime.utcnow())
+            pending_count = len(self._pending)
+        self._added(pending_count)
+
+    def get(self, user_id, manga_id):
+        """(chapter_id, page) for a user, from the buffer first and the database otherwise; None if unknown."""
+        with self._lock:
+            pending = self._pending.get((user_id, manga_id))
+        if pending:
+            return pending[0], pending[1]
+        progress = ReadingProgress.query.filter_by(user_id=user_id, manga_id=manga_id).first()
+        if progress is None or progress.chapter_id is None:
+            return None
+        return progress.chapter_id, progress.page
+
+    def _take(self):
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending):
+        # put the positions back unless newer ones arrived meanwhile
+        for key, value in pending.items():
+            self._pending.setdefault(key, value)
+
+    def _write(self, pending):
+        # progress for a manga deleted in the meantime would come back as an orphan
+        live = {
+            manga_id for (manga_id,) in
+            db.session.query(Manga.id).filter(Manga.id.in_({key[1] for key in pending}))
+        }
+        rows = [
+            {'user_id': user_id, 'manga_id': manga_id, 'chapter_id': chapter_id,
+             'page': page, 'updated_at': updated_at}
+            for (user_id, manga_id), (chapter_id, page, updated_at) in pending.items()
+            if manga_id in live
+        ]
+        if rows:
+            stmt = insert(ReadingProgress)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id', 'manga_id'],
+                set_={
+                    'chapter_id': stmt.excluded.chapter_id,
+                    'page': stmt.excluded.page,
+                    'updated_at': stmt.excluded.updated_at,
+                },
+                # another worker may have flushed a newer position already
+                where=ReadingProgress.updated_at <= stmt.excluded.updated_at
+            )
+            db.session.execute(stmt, rows)
+        return len(rows)
+
+
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,100 @@
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, insert
+from app import db
+from app.models import Manga, Chapter, Bookmark, Like, MangaSimilarity
+
+TOP_K = 12
+CHUNK_SIZE = 512        # items scored per sparse product, bounds peak memory
+INSERT_BATCH = 10000
+
+
+def item_similarities(user_idx, item_idx, n_users, n_items, top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """
+        Top-K cosine neighbours of every item in a binary user x item matrix.
+        `user_idx` / `item_idx` are parallel arrays of interactions (duplicates are fine).
+        Items are processed `chunk_size` at a time, so only a chunk x n_items block of
+        the similarity matrix exists at once.
+        Returns parallel arrays (items, neighbours, scores, ranks).
+    """
+    X = sparse.csr_matrix(
+        (np.ones(len(user_idx), dtype=np.float32), (user_idx, item_idx)),
+        shape=(n_users, n_items)
+    )
+    X.data[:] = 1.0  # bookmark + like by the same user count once
+
+    # binary matrix: squared column norm == column sum
+    norms = np.sqrt(np.asarray(X.sum(axis=0)).ravel())
+    inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    Xn = (X @ sparse.diags(inv_norms)).tocsc()
+    XnT = Xn.T.tocsr()
+
+    items, neighbours, scores, ranks = [], [], [], []
+    for start in range(0, n_items, chunk_size):
+        stop = min(start + chunk_size, n_items)
+        block = (XnT[start:stop] @ Xn).tocsr()
+
+        for row in range(stop - start):
+            lo, hi = block.indptr[row], block.indptr[row + 1]
+            cols = block.indices[lo:hi]
+            vals = block.data[lo:hi]
+
+            keep = cols != start + row  # an item is not its own recommendation
+            cols, vals = cols[keep], vals[keep]
+            if not len(vals):
+                continue
+
+            if len(vals) > top_k:
+                best = np.argpartition(-vals, top_k)[:top_k]
+                cols, vals = cols[best], vals[best]
+            order = np.lexsort((cols, -vals))
+
+            items.append(np.full(len(order), start + row, dtype=np.int64))
+            neighbours.append(cols[order])
+            scores.append(vals[order])
+            ranks.append(np.arange(1, len(order) + 1))
+
+    if not items:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0), empty
+    return (np.concatenate(items), np.concatenate(neighbours),
+            np.concatenate(scores), np.concatenate(ranks))
+
+
+def load_interactions():
+    """(user_ids, manga_ids) arrays from Bookmark and Like (chapter likes count for their manga)."""
+    bookmarks = db.session.query(Bookmark.user_id, Bookmark.manga_id).all()
+    likes = (
+        db.session.query(Like.user_id, func.coalesce(Like.manga_id, Chapter.manga_id))
+        .outerjoin(Chapter, Chapter.id == Like.chapter_id)
+        .all()
+    )
+    pairs = np.array([p for p in bookmarks + likes if p[1] is not None], dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def compute_similar_manga(top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """Rebuild the MangaSimilarity table. Returns the number of rows written."""
+    user_ids, manga_ids = load_interactions()
+    existing = np.array([mid for (mid,) in db.session.query(Manga.id)], dtype=np.int64)
+    known = np.isin(manga_ids, existing)
+    user_ids, manga_ids = user_ids[known], manga_ids[known]
+
+    users, user_idx = np.unique(user_ids, return_inverse=True)
+    mangas, item_idx = np.unique(manga_ids, return_inverse=True)
+    items, neighbours, scores, ranks = item_similarities(
+        user_idx, item_idx, len(users), len(mangas), top_k, chunk_size
+    )
+
+    MangaSimilarity.query.delete()
+    manga_col, similar_col = mangas[items].tolist(), mangas[neighbours].tolist()
+    scores, ranks = scores.tolist(), ranks.tolist()
+    for start in range(0, len(manga_col), INSERT_BATCH):
+        stop = start + INSERT_BATCH
+        db.session.execute(insert(MangaSimilarity), [
+            {'manga_id': m, 'similar_id': s, 'score': sc, 'rank': r}
+            for m, s, sc, r in zip(manga_col[start:stop], similar_col[start:stop],
+                                   scores[start:stop], ranks[start:stop])
+        ])
+    db.session.commit()
+    return len(manga_col)
@@ -0,0 +1,197 @@
+import re
+from sqlalchemy import text
+from app import db
+from app.models import Manga, TrendingScore
+from app.utils.cache import TTLCache, VersionStamp, MISSING
+from app.utils.keyset import keyset_page
+
+# SQLite FTS5 index over manga title, description and author pen name.
+# rowid is the manga id; the table is maintained from the author routes and
+# created on first use (or by `flask rebuild-search-index`), not at startup.
+FTS_TABLE = 'manga_fts'
+FTS_COLUMNS = ('title', 'description', 'pen_name')
+
+# bm25() column weights, same order as FTS_COLUMNS
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+SEARCH_PAGE_SIZE = 20
+
+# Result pages (manga ids + next cursor) keyed by (normalized query, filter, cursor, limit).
+# Cleared on every write, in other workers too through the version stamp.
+search_results_cache = TTLCache(ttl=30, maxsize=2048, stamp=VersionStamp('search'))
+
+
+# Databases (engine URLs) this process has seen the table in; until then the first use checks for it
+_ready_databases = set()
+
+
+def _create_search_index():
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{', '.join(FTS_COLUMNS)}, "
+        "tokenize = 'unicode61 remove_diacritics 2', "
+        "prefix = '2 3')"
+    ))
+
+
+def _fill_search_index():
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, description, pen_name) "
+        "SELECT manga.id, manga.title, coalesce(manga.description, ''), author.pen_name "
+        "FROM manga JOIN author ON author.id = manga.author_id"
+    ))
+
+
+def ensure_search_index():
+    """
+        Lazy first-use check: create and fill the FTS5 table if this database
+        doesn't have it yet (caller commits). Returns True when it was just created.
+    """
+    database = str(db.engine.url)
+    if database in _ready_databases:
+        return False
+
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    if exists:
+        _ready_databases.add(database)
+        return False
+
+    _create_search_index()
+    _fill_search_index()
+    return True
+
+
+def include_in_migrations(object, name, type_, reflected, compare_to):
+    """Alembic include_object hook: keep the FTS5 table and its shadow tables out of autogenerate."""
+    return not (type_ == 'table' and name.startswith(FTS_TABLE))
+
+
+def index_manga(manga):
+    """Insert or refresh one manga in the search index (caller commits)."""
+    ensure_search_index()
+    unindex_manga(manga.id)
+    db.session.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, description, pen_name) "
+             "VALUES (:id, :title, :description, :pen_name)"),
+        {
+            'id': manga.id,
+            'title': manga.title,
+            'description': manga.description or '',
+            'pen_name': manga.author.pen_name if manga.author else '',
+        }
+    )
+
+
+def unindex_manga(manga_id):
+    """Remove one manga from the search index (caller commits)."""
+    ensure_search_index()
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': manga_id})
+
+
+def rebuild_search_index():
+    """Drop and repopulate the whole index from Manga/Author. Returns the row count."""
+    db.session.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    _create_search_index()
+    _fill_search_index()
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+def match_expression(query, columns=None):
+    """
+        Turn free text into an FTS5 MATCH expression: every word must match,
+        each as a prefix ("one pie" finds "One Piece"). Returns None if the
+        text has no searchable words.
+    """
+    words = re.findall(r'\w+', query or '')
+    if not words:
+        return None
+
+    expression = ' '.join(f'"{word}"*' for word in words)
+    if columns:
+        expression = f"{{{' '.join(columns)}}} : ({expression})"
+    return expression
+
+
+def search_matches(query, columns=None):
+    """
+        Subquery of (manga_id, rank) for manga matching `query`; lower rank is
+        more relevant (BM25). Join it against Manga.id. Returns None when the
+        query has no searchable words.
+    """
+    expression = match_expression(query, columns)
+    if expression is None:
+        return None
+    if ensure_search_index():
+        db.session.commit()
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    return (
+        text(f"SELECT rowid AS manga_id, bm25({FTS_TABLE}, {weights}) AS rank "
+             f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression")
+        .bindparams(expression=expression)
+        .columns(manga_id=db.Integer, rank=db.Float)
+        .subquery('fts')
+    )
+
+
+# ---------------------------------
+#       PAGED, CACHED RESULTS
+# ---------------------------------
+def normalize_query(query):
+    """Lowercase and collapse whitespace so equivalent queries share a cache entry."""
+    return ' '.join((query or '').lower().split())
+
+
+def invalidate_search_results():
+    """Forget cached result pages; call after manga, bookmark or like changes."""
+    search_results_cache.invalidate()
+
+
+def search_manga_page(query, filter_type, cursor=None, limit=SEARCH_PAGE_SIZE):
+    """
+        One keyset page of manga ids for the search blueprint, newest/most
+        relevant/most popular first depending on `filter_type`.
+        Returns (ids, next_cursor); served from search_results_cache when possible.
+    """
+    query = normalize_query(query)
+    cache_key = (query, filter_type, cursor, limit)
+    cached = search_results_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    ids_query = db.session.query(Manga.id).select_from(Manga)
+
+    matches = None
+    if query:
+        matches = search_matches(query)
+        if matches is None:
+            search_results_cache.set(cache_key, ((), None))
+            return (), None
+        ids_query = ids_query.join(matches, matches.c.manga_id == Manga.id)
+
+    if filter_type == 'relevance' and matches is not None:
+        sort_key = -matches.c.rank  # bm25: lower is better
+    elif filter_type == 'bookmarked':
+        sort_key = Manga.bookmark_count
+    elif filter_type == 'liked':
+        sort_key = Manga.like_count
+    elif filter_type == 'trending':
+        # precomputed by `flask compute-trending`
+        ids_query = ids_query.join(TrendingScore, TrendingScore.manga_id == Manga.id)
+        sort_key = TrendingScore.score
+    else:
+        sort_key = Manga.created_at
+
+    columns = [sort_key, Manga.id]
+    rows, next_cursor = keyset_page(
+        ids_query.with_entities(*columns), columns, cursor, limit, key=tuple
+    )
+
+    result = (tuple(row[-1] for row in rows), next_cursor)
+    search_results_cache.set(cache_key, result)
+    return result
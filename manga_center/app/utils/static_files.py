@@ -0,0 +1,109 @@
+import hashlib
+import mimetypes
+import os
+import re
+from flask import current_app, request, send_file, abort
+from werkzeug.security import safe_join
+
+# Static URLs carry a version. Blob store files, and the _variants/ and thumbs/
+# files derived from them, are named by the blob's SHA-256, so their name is
+# the fingerprint. CSS and JS get ?v=<fingerprint of mtime + size> from
+# url_for('static', ...). A request whose version matches the file on disk is
+# cached for a year as immutable; anything else must revalidate its ETag.
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+_BLOB_FILE = re.compile(
+    r'^uploads/blobs/[0-9a-f]{2}/[0-9a-f]{2}/'
+    r'(?:(?:_variants|thumbs)/([0-9a-f]{64})\.(\w+)\.webp|([0-9a-f]{64})\.\w+)$'
+)
+_VERSIONED_SUFFIXES = ('.css', '.js')
+
+# filename -> version, filled on first url_for; re-checked on every call only in debug
+_versions = {}
+
+
+def blob_hash(filename):
+    """
+        Fingerprint of a content-addressed file: the blob's SHA-256, plus the
+        variant for a derived file. None for any other static file.
+    """
+    match = _BLOB_FILE.match(filename or '')
+    if not match:
+        return None
+    sha256, variant, original = match.groups()
+    return f"{sha256}.{variant}" if sha256 else original
+
+
+def _fingerprint(path):
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return None
+    return hashlib.blake2s(f"{stat.st_mtime_ns}:{stat.st_size}".encode(), digest_size=6).hexdigest()
+
+
+def static_version(filename):
+    """Short fingerprint of a CSS/JS file (None for other files or when missing), stat()ed once per process."""
+    if not (filename or '').endswith(_VERSIONED_SUFFIXES):
+        return None
+    if filename in _versions and not current_app.debug:
+        return _versions[filename]
+    version = _fingerprint(safe_join(current_app.static_folder, filename))
+    _versions[filename] = version
+    return version
+
+
+def add_static_version(endpoint, values):
+    """url_defaults hook: fingerprint url_for('static', ...) of CSS and JS files."""
+    if endpoint != 'static' or 'v' in values:
+        return
+    version = static_version(values.get('filename'))
+    if version:
+        values['v'] = version
+
+
+def serve_static(filename):
+    """Replacement for Flask's static view: strong ETags, 304s and far-future caching of versioned URLs."""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    content_hash = blob_hash(filename)
+    if content_hash is not None:
+        etag, immutable = content_hash, True
+    else:
+        # fresh fingerprint: a file changed without a restart must not be served as the old version
+        etag = _fingerprint(path)
+        immutable = False
+        if filename.endswith(_VERSIONED_SUFFIXES):
+            _versions[filename] = etag
+            immutable = request.args.get('v') == etag
+
+    accel_prefix = current_app.config.get('STATIC_X_ACCEL_PREFIX')
+    if accel_prefix:
+        # nginx serves the bytes from an `internal` location mapped to the static folder
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+        response.set_etag(etag)
+        response.make_conditional(request)
+    else:
+        # send_file honours USE_X_SENDFILE (Apache mod_xsendfile, lighttpd)
+        response = send_file(path, etag=etag, conditional=True, max_age=None)
+
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def init_static_files(app):
+    app.url_defaults(add_static_version)
+    app.view_functions['static'] = serve_static
@@ -0,0 +1,46 @@
+import os
+from PIL import Image, ImageOps
+
+# Fixed-size WebP variants of covers and profile pictures, by rendering context.
+# Covers are 2:3 and cropped to fill; originals stay for the full-size views.
+COVER_SIZES = {
+    'thumb': (160, 240),   # "readers also bookmarked" strip
+    'card': (320, 480),    # card grids
+    'large': (600, 900),   # manga detail page
+}
+PROFILE_PIC_SIZES = {
+    'avatar': (64, 64),
+    'profile': (256, 256),
+}
+THUMB_QUALITY = 82
+
+# Variants live in a subfolder next to the original
+THUMBS_FOLDER = 'thumbs'
+
+
+def thumbnail_path(path, size):
+    """Path of the `size` variant of the image at `path` (works for file and URL paths)."""
+    folder, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, THUMBS_FOLDER, f"{stem}.{size}.webp").replace('\\', '/')
+
+
+def make_thumbnails(source_path, sizes):
+    """
+        Write one cropped WebP per entry of `sizes` next to `source_path`.
+        Returns the size names written, or None if the image can't be read.
+    """
+    os.makedirs(os.path.join(os.path.dirname(source_path), THUMBS_FOLDER), exist_ok=True)
+    try:
+        with Image.open(source_path) as img:
+            img.load()
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+            for size, box in sizes.items():
+                thumb = ImageOps.fit(img, box, Image.LANCZOS)
+                thumb.save(thumbnail_path(source_path, size), 'WEBP', quality=THUMB_QUALITY, method=4)
+    except (OSError, ValueError):
+        return None
+    return sorted(sizes)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, insert
+from app import db
+from app.models import Manga, Chapter, Bookmark, Like, Comment, TrendingScore, MangaViewHour
+
+# How much one event of each kind is worth before decay
+EVENT_WEIGHTS = {
+    'bookmark': 3.0,
+    'like': 2.0,
+    'comment': 1.0,
+    'chapter': 5.0,
+    'view': 0.1,
+}
+HALF_LIFE_HOURS = 48
+WINDOW_DAYS = 14
+
+
+def _hourly_event_counts(manga_id, timestamp, since, now, *joins):
+    """
+        Events per (manga, age in whole hours) since `since`, aggregated in SQL so
+        only a few rows per manga reach Python. Returns an (n, 3) float array.
+    """
+    age_hours = func.cast((func.julianday(now) - func.julianday(timestamp)) * 24, db.Integer)
+    query = db.session.query(manga_id, age_hours, func.count())
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+    rows = (
+        query.filter(timestamp >= since, manga_id.isnot(None))
+        .group_by(manga_id, age_hours)
+        .all()
+    )
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def _hourly_view_counts(since, now):
+    """Same shape as _hourly_event_counts, summed from the MangaViewHour rollup."""
+    age_hours = func.cast((func.julianday(now) - func.julianday(MangaViewHour.hour)) * 24, db.Integer)
+    rows = (
+        db.session.query(
+            MangaViewHour.manga_id, age_hours,
+            func.sum(MangaViewHour.page_views + MangaViewHour.chapter_views)
+        )
+        .filter(MangaViewHour.hour >= since)
+        .group_by(MangaViewHour.manga_id, age_hours)
+        .all()
+    )
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def collect_events(now, window_days=WINDOW_DAYS):
+    """Hourly event counts for every event kind inside the window."""
+    since = now - timedelta(days=window_days)
+    return {
+        'bookmark': _hourly_event_counts(Bookmark.manga_id, Bookmark.created_at, since, now),
+        # chapter likes count towards their manga
+        'like': _hourly_event_counts(
+            func.coalesce(Like.manga_id, Chapter.manga_id), Like.created_at, since, now,
+            (Chapter, Chapter.id == Like.chapter_id)
+        ),
+        'comment': _hourly_event_counts(Comment.manga_id, Comment.created_at, since, now),
+        'chapter': _hourly_event_counts(Chapter.manga_id, Chapter.upload_date, since, now),
+        'view': _hourly_view_counts(since, now),
+    }
+
+
+def score_events(events, half_life_hours=HALF_LIFE_HOURS):
+    """
+        Sum of weight * count * 2^(-age / half_life) per manga.
+        Returns (manga_ids, scores) as NumPy arrays.
+    """
+    parts = [
+        (counts[:, 0], counts[:, 2] * EVENT_WEIGHTS[kind] * np.exp2(-counts[:, 1] / half_life_hours))
+        for kind, counts in events.items() if len(counts)
+    ]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    manga_ids = np.concatenate([ids for ids, _ in parts])
+    weighted = np.concatenate([w for _, w in parts])
+
+    unique_ids, index = np.unique(manga_ids, return_inverse=True)
+    scores = np.bincount(index, weights=weighted)
+    return unique_ids.astype(np.int64), scores
+
+
+def compute_trending(now=None, half_life_hours=HALF_LIFE_HOURS, window_days=WINDOW_DAYS):
+    """Recompute and atomically replace the TrendingScore snapshot. Returns the row count."""
+    now = now or datetime.utcnow()
+    manga_ids, scores = score_events(collect_events(now, window_days), half_life_hours)
+
+    # skip ids of manga deleted since the events were written
+    existing = {mid for (mid,) in db.session.query(Manga.id)}
+    rows = [
+        {'manga_id': int(mid), 'score': float(score), 'computed_at': now}
+        for mid, score in zip(manga_ids.tolist(), scores.tolist()) if mid in existing
+    ]
+
+    TrendingScore.query.delete()
+    if rows:
+        db.session.execute(insert(TrendingScore), rows)
+    db.session.commit()
+    return len(rows)
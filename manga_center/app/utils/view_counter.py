@@ -0,0 +1,106 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models import Manga, Chapter, MangaViewHour
+from app.utils.write_behind import WriteBehindBuffer
+
+# Views are counted in memory per worker and added to the database every
+# FLUSH_INTERVAL seconds: one executemany `UPDATE ... SET view_count =
+# view_count + ?` per table plus one upsert into the hourly rollup. Increments
+# commute, so workers never need to coordinate.
+FLUSH_INTERVAL = 10.0
+MAX_PENDING = 5000
+
+_manga_table = Manga.__table__
+_chapter_table = Chapter.__table__
+
+
+def is_prefetch(request):
+    """Speculative loads (browser prefetch and prerender) aren't views."""
+    purpose = request.headers.get('Sec-Purpose') or request.headers.get('Purpose') or request.headers.get('X-Moz') or ''
+    return 'prefetch' in purpose.lower()
+
+
+class ViewCounter(WriteBehindBuffer):
+    """Aggregating write-behind buffer for Manga/Chapter.view_count and MangaViewHour."""
+
+    name = 'view-counter'
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        super().__init__(interval, max_pending)
+        self._hours = {}            # (manga_id, hour) -> [page_views, chapter_views]
+        self._chapters = Counter()  # chapter_id -> views
+
+    def count(self, manga_id, chapter_id=None):
+        """One view of a manga page, or of a chapter when `chapter_id` is given."""
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            views = self._hours.setdefault((manga_id, hour), [0, 0])
+            if chapter_id is None:
+                views[0] += 1
+            else:
+                views[1] += 1
+                self._chapters[chapter_id] += 1
+            pending_count = len(self._hours) + len(self._chapters)
+        self._added(pending_count)
+
+    def _take(self):
+        if not self._hours:
+            return None
+        pending = (self._hours, self._chapters)
+        self._hours, self._chapters = {}, Counter()
+        return pending
+
+    def _restore(self, pending):
+        hours, chapters = pending
+        for key, (page_views, chapter_views) in hours.items():
+            views = self._hours.setdefault(key, [0, 0])
+            views[0] += page_views
+            views[1] += chapter_views
+        self._chapters.update(chapters)
+
+    def _write(self, pending):
+        hours, chapters = pending
+
+        manga_views = Counter()
+        for (manga_id, _), (page_views, chapter_views) in hours.items():
+            manga_views[manga_id] += page_views + chapter_views
+
+        db.session.execute(
+            _manga_table.update()
+            .where(_manga_table.c.id == bindparam('row_id'))
+            .values(view_count=_manga_table.c.view_count + bindparam('views')),
+            [{'row_id': manga_id, 'views': views} for manga_id, views in manga_views.items()]
+        )
+        if chapters:
+            db.session.execute(
+                _chapter_table.update()
+                .where(_chapter_table.c.id == bindparam('row_id'))
+                .values(view_count=_chapter_table.c.view_count + bindparam('views')),
+                [{'row_id': chapter_id, 'views': views} for chapter_id, views in chapters.items()]
+            )
+
+        # no rollup rows for manga deleted since the views were counted
+        live = {manga_id for (manga_id,) in db.session.query(Manga.id).filter(Manga.id.in_(manga_views))}
+        rows = [
+            {'manga_id': manga_id, 'hour': hour, 'page_views': page_views, 'chapter_views': chapter_views}
+            for (manga_id, hour), (page_views, chapter_views) in hours.items() if manga_id in live
+        ]
+        if rows:
+            stmt = insert(MangaViewHour)
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['manga_id', 'hour'],
+                    set_={
+                        'page_views': MangaViewHour.page_views + stmt.excluded.page_views,
+                        'chapter_views': MangaViewHour.chapter_views + stmt.excluded.chapter_views,
+                    }
+                ),
+                rows
+            )
+        return sum(manga_views.values())
+
+
+view_counter = ViewCounter()
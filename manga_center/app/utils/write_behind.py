@@ -0,0 +1,85 @@
+import atexit
+import os
+import threading
+from app import db
+
+
+class WriteBehindBuffer:
+    """
+        Base for per-process buffers that absorb hot writes in memory and send
+        them to the database in one transaction every `interval` seconds
+        (sooner once `max_pending` keys wait, and at exit).
+        Subclasses keep their data under self._lock and implement _take,
+        _restore and _write.
+    """
+
+    name = 'write-behind'
+
+    def __init__(self, interval, max_pending):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self.flush)
+
+    def _take(self):
+        """Swap out and return everything pending (called with the lock held)."""
+        raise NotImplementedError
+
+    def _restore(self, pending):
+        """Merge back what a failed flush took (called with the lock held)."""
+        raise NotImplementedError
+
+    def _write(self, pending):
+        """Issue the batched statements, inside an app context; flush() commits. Returns a row count."""
+        raise NotImplementedError
+
+    def _added(self, pending_count):
+        """Call after buffering something, with the number of keys now pending."""
+        self._ensure_thread()
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything pending in one transaction. Returns what _write reported."""
+        with self._lock:
+            pending = self._take()
+        if not pending or self.app is None:
+            return 0
+
+        with self.app.app_context():
+            try:
+                written = self._write(pending)
+                db.session.commit()
+                return written
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Flushing %s buffer failed", self.name)
+                with self._lock:
+                    self._restore(pending)
+                return 0
+            finally:
+                db.session.remove()
+
+    def _ensure_thread(self):
+        # started lazily, and again in a forked worker (threads don't survive fork)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
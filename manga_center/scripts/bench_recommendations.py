@@ -0,0 +1,125 @@
+"""
+    Benchmark the "readers also bookmarked" similarity job on synthetic data.
+
+    Two measurements:
+      matrix step   item_similarities() alone, on in-memory arrays
+      end to end    compute_similar_manga() against a seeded temporary SQLite
+                    database: loading bookmarks, the matrix step and writing
+                    the MangaSimilarity rows (skip with --matrix-only)
+
+    Usage (from manga_center/):
+        python scripts/bench_recommendations.py --bookmarks 1000000 --users 200000 --manga 50000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Author, Manga, Bookmark, MangaSimilarity  # noqa: E402
+from app.utils.recommendations import (  # noqa: E402
+    item_similarities, compute_similar_manga, load_interactions, TOP_K, CHUNK_SIZE
+)
+
+SEED_BATCH = 50000
+
+
+def synthetic_bookmarks(n_bookmarks, n_users, n_manga, seed=42):
+    """Interactions with a Zipf-like popularity curve, like a real catalogue."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_manga + 1) ** 0.8
+    popularity /= popularity.sum()
+    users = rng.integers(0, n_users, n_bookmarks)
+    manga = rng.choice(n_manga, size=n_bookmarks, p=popularity)
+    return users, manga
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed_database(users, manga, n_users, n_manga):
+    """Bulk-insert the synthetic users, manga and (deduplicated) bookmarks. Returns the bookmark count."""
+    author_user = User(username='bench_author', email='bench_author@example.com', password='-')
+    author = Author(user=author_user, pen_name='Bench')
+    db.session.add(author)
+    db.session.flush()
+
+    def insert_rows(model, rows):
+        for start in range(0, len(rows), SEED_BATCH):
+            db.session.execute(db.insert(model), rows[start:start + SEED_BATCH])
+
+    insert_rows(User, [
+        {'id': i + 2, 'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password': '-'}
+        for i in range(n_users)
+    ])
+    insert_rows(Manga, [
+        {'id': i + 1, 'title': f'Manga {i}', 'author_id': author.id} for i in range(n_manga)
+    ])
+    # one bookmark per (user, manga), as the unique constraint requires
+    pairs = np.unique(users.astype(np.int64) * n_manga + manga)
+    insert_rows(Bookmark, [
+        {'user_id': int(pair // n_manga) + 2, 'manga_id': int(pair % n_manga) + 1}
+        for pair in pairs
+    ])
+    db.session.commit()
+    return len(pairs)
+
+
+def bench_end_to_end(users, manga, args):
+    with tempfile.TemporaryDirectory() as folder:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            count = seed_database(users, manga, args.users, args.manga)
+            print(f"seeded {count:,} bookmarks in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            load_interactions()
+            load_elapsed = time.perf_counter() - started
+            db.session.rollback()
+
+            started = time.perf_counter()
+            rows = compute_similar_manga(args.top_k, args.chunk_size)
+            elapsed = time.perf_counter() - started
+            written = db.session.query(MangaSimilarity).count()
+            db.session.remove()
+
+    print(f"end to end: {rows:,} similarity rows ({written:,} in the table) in {elapsed:.1f}s, "
+          f"of which loading interactions {load_elapsed:.1f}s (peak RSS {peak_rss_mb():.0f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookmarks', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--manga', type=int, default=50_000)
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--matrix-only', action='store_true', help='Skip the end-to-end database run.')
+    args = parser.parse_args()
+
+    users, manga = synthetic_bookmarks(args.bookmarks, args.users, args.manga)
+    print(f"{args.bookmarks:,} bookmarks, {args.users:,} users, {args.manga:,} manga")
+
+    started = time.perf_counter()
+    items, neighbours, scores, ranks = item_similarities(
+        users, manga, args.users, args.manga, args.top_k, args.chunk_size
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"matrix step only: {len(items):,} similarity rows in {elapsed:.1f}s (peak RSS {peak_rss_mb():.0f} MB)")
+
+    if not args.matrix_only:
+        bench_end_to_end(users, manga, args)
+
+
+if __name__ == '__main__':
+    main()
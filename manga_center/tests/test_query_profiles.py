@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User, Author, Genre, Manga, Chapter, Bookmark
+from app.utils.chapter_toc import toc_cache
+from app.utils.genres import genre_cache
+from app.utils.search_index import rebuild_search_index, search_results_cache
+
+# Card pages must issue a fixed number of statements whatever the number of
+# manga on them (see utils.query_profiles); a lazy load per card breaks this.
+PAGES = {
+    'index': '/',
+    'genre': '/genre/action',
+    'all_manga': '/manga',
+    'search': '/search?q=series',
+    'view_author': '/author/1',
+    'my_library': '/my_library',
+}
+
+
+def make_client(tmp_path, manga_count):
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / f'manga_{manga_count}.db'}",
+    })
+    with app.app_context():
+        db.create_all()
+        reader = User(username='reader', email='reader@example.com', password=generate_password_hash('secret1'))
+        genre = Genre(name='Action', slug='action')
+        db.session.add_all([reader, genre])
+
+        def new_author(n):
+            user = User(username=f'writer{n}', email=f'writer{n}@example.com', password='-')
+            author = Author(user=user, pen_name=f'Pen Name {n}')
+            db.session.add(author)
+            return author
+
+        # half the manga by author 1 (view_author), the others each by their own author,
+        # so lazy loads of Manga.author would grow with the page too
+        first_author = new_author(0)
+        start = datetime(2024, 1, 1)
+        for i in range(manga_count):
+            uploaded = start + timedelta(days=i)
+            manga = Manga(title=f'Series {i:02d}', description='A story',
+                          author=first_author if i % 2 == 0 else new_author(i + 1),
+                          created_at=uploaded, last_chapter_at=uploaded)
+            manga.genres.append(genre)
+            db.session.add(manga)
+            db.session.flush()
+            for number in (1, 2):
+                db.session.add(Chapter(title=f'Chapter {number}', number=number, manga_id=manga.id,
+                                       upload_date=uploaded + timedelta(hours=number)))
+            db.session.add(Bookmark(user_id=reader.id, manga_id=manga.id))
+        db.session.commit()
+        rebuild_search_index()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'reader', 'password': 'secret1'})
+    return app, client
+
+
+def statement_count(app, client, url):
+    # in-process caches are shared by both apps; measure every request cold
+    for cache in (toc_cache, genre_cache, search_results_cache):
+        cache.clear()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, url
+    return len(statements)
+
+
+@pytest.fixture
+def clients(tmp_path):
+    return {n: make_client(tmp_path, n) for n in (3, 15)}
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_statement_count_does_not_grow_with_items(clients, page):
+    url = PAGES[page]
+    few = statement_count(*clients[3], url)
+    many = statement_count(*clients[15], url)
+    assert few == many, f"{page}: {few} statements for 3 manga, {many} for 15"